@@ -1,12 +1,224 @@
+import ast
 import os
 import re
 import difflib
+import threading
 from pathlib import Path
+from workspace_watcher import subscribe, workspace_files
+
+CHARS_PER_TOKEN = 4
+STOPWORDS = {
+    'the', 'and', 'for', 'with', 'that', 'this', 'from', 'into', 'when', 'what', 'why',
+    'how', 'are', 'was', 'not', 'but', 'fix', 'make', 'please', 'file', 'files', 'code',
+}
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting (about 4 characters per token)"""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def split_identifier_terms(text):
+    """Lowercase word terms of a text, splitting snake_case and CamelCase identifiers"""
+    terms = set()
+    for word in re.findall(r'[A-Za-z][A-Za-z0-9_]*', text):
+        terms.add(word.lower())
+        for part in re.findall(r'[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])', word):
+            terms.add(part.lower())
+    return terms
+
+
+class ContextPacker:
+    """
+    Splits files into ast-aware chunks (functions, classes, methods, module-level code),
+    scores them against a prompt and greedily fills a token budget.
+    Chunk boundaries are cached per file mtime.
+    """
+
+    def __init__(self, max_chunk_tokens=400):
+        self.max_chunk_tokens = max_chunk_tokens
+        self._chunk_cache = {}
+        self._lock = threading.Lock()
+        subscribe(self._on_changes)
+
+    def _on_changes(self, events):
+        # Runs on the watcher thread
+        with self._lock:
+            for event in events:
+                if event.kind == 'rescan' or event.is_dir:
+                    prefix = event.path + os.sep
+                    for path in [p for p in self._chunk_cache if p == event.path or p.startswith(prefix)]:
+                        self._chunk_cache.pop(path, None)
+                else:
+                    self._chunk_cache.pop(event.path, None)
+
+    def chunk_file(self, file_path):
+        """Return the chunks of a file as dicts with name, start, end (1-based lines) and text"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return []
+        key = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            cached = self._chunk_cache.get(os.path.abspath(file_path))
+        if cached and cached[0] == key:
+            return cached[1]
+
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                content = f.read()
+        except OSError:
+            return []
+
+        lines = content.splitlines()
+        spans = None
+        if file_path.endswith('.py'):
+            try:
+                spans = self._python_spans(ast.parse(content), lines)
+            except (SyntaxError, ValueError):
+                spans = None
+        if spans is None:
+            spans = self._text_spans(lines)
+
+        chunks = []
+        for name, start, end in spans:
+            while end > start and not lines[end - 1].strip():
+                end -= 1
+            text = "\n".join(lines[start - 1:end])
+            if text.strip():
+                chunks.append({'name': name, 'start': start, 'end': end, 'text': text})
+        with self._lock:
+            self._chunk_cache[os.path.abspath(file_path)] = (key, chunks)
+        return chunks
+
+    def _node_span(self, node):
+        start = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+        return start, node.end_lineno
+
+    def _python_spans(self, tree, lines):
+        """(name, start, end) spans for top-level definitions, with gaps kept as module chunks"""
+        spans = []
+        covered_until = 0
+        pending_start = None
+
+        def flush_module(end):
+            if pending_start is not None and end >= pending_start:
+                spans.append(('<module>', pending_start, end))
+
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start, end = self._node_span(node)
+                flush_module(start - 1)
+                pending_start = None
+                spans.extend(self._definition_spans(node, start, end, lines))
+                covered_until = end
+            elif pending_start is None:
+                pending_start = node.lineno
+                covered_until = node.end_lineno
+            else:
+                covered_until = node.end_lineno
+        flush_module(covered_until)
+        return spans
+
+    def _definition_spans(self, node, start, end, lines):
+        size = estimate_tokens("\n".join(lines[start - 1:end]))
+        if not isinstance(node, ast.ClassDef) or size <= self.max_chunk_tokens:
+            return [(node.name, start, end)]
+        # Large class: split into a header chunk and one chunk per method
+        methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+        if not methods:
+            return [(node.name, start, end)]
+        spans = []
+        header_end = self._node_span(methods[0])[0] - 1
+        if header_end >= start:
+            spans.append((node.name, start, header_end))
+        for i, method in enumerate(methods):
+            m_start, m_end = self._node_span(method)
+            if i + 1 < len(methods):
+                m_end = max(m_end, self._node_span(methods[i + 1])[0] - 1)
+            else:
+                m_end = end
+            spans.append((f"{node.name}.{method.name}", m_start, m_end))
+        return spans
+
+    def _text_spans(self, lines):
+        """Paragraph spans (separated by blank lines) capped at max_chunk_tokens"""
+        spans = []
+        start = None
+        size = 0
+        for i, line in enumerate(lines, 1):
+            if not line.strip():
+                if start is not None:
+                    spans.append(('<text>', start, i - 1))
+                    start = None
+                continue
+            if start is None:
+                start, size = i, 0
+            size += len(line) + 1
+            if size // CHARS_PER_TOKEN >= self.max_chunk_tokens:
+                spans.append(('<text>', start, i))
+                start = None
+        if start is not None:
+            spans.append(('<text>', start, len(lines)))
+        return spans
+
+    def score_chunk(self, chunk, prompt_terms, file_bonus=0.0):
+        name_terms = split_identifier_terms(chunk['name'])
+        text_terms = split_identifier_terms(chunk['text'])
+        score = file_bonus
+        for term in prompt_terms:
+            if term in name_terms:
+                score += 3.0
+            elif term in text_terms:
+                score += 1.0
+        return score
+
+    def pack(self, file_paths, prompt, token_budget, mentioned_files=()):
+        """
+        Greedily fill token_budget with the best scoring chunks of file_paths.
+        Returns {file_path: packed_text} with chunks kept in file order.
+        """
+        prompt_terms = {t for t in split_identifier_terms(prompt) if len(t) >= 3 and t not in STOPWORDS}
+        mentioned = {os.path.basename(m) for m in mentioned_files}
+
+        candidates = []
+        for order, file_path in enumerate(file_paths):
+            file_bonus = 2.0 if os.path.basename(file_path) in mentioned else 0.0
+            for chunk in self.chunk_file(file_path):
+                score = self.score_chunk(chunk, prompt_terms, file_bonus)
+                cost = estimate_tokens(chunk['text'])
+                candidates.append((score, order, cost, file_path, chunk))
+
+        # Chunks that match nothing are only used when nothing matches at all
+        scored = [c for c in candidates if c[0] > 0] or [c for c in candidates if c[4]['name'] == '<module>']
+        scored.sort(key=lambda c: (-c[0], c[1], c[2]))
+
+        selected = {}
+        used = 0
+        for score, order, cost, file_path, chunk in scored:
+            header_cost = 0 if file_path in selected else estimate_tokens(file_path) + 2
+            if used + cost + header_cost > token_budget:
+                continue
+            selected.setdefault(file_path, []).append(chunk)
+            used += cost + header_cost
+
+        packed = {}
+        for file_path in file_paths:
+            if file_path not in selected:
+                continue
+            parts = []
+            for chunk in sorted(selected[file_path], key=lambda c: c['start']):
+                parts.append(f"# lines {chunk['start']}-{chunk['end']}\n{chunk['text']}")
+            packed[file_path] = "\n...\n".join(parts)
+        return packed
+
 
 class AgentUtils:
-    def __init__(self, max_context_files=5, max_file_size=2000):
+    def __init__(self, max_context_files=5, max_file_size=2000, token_budget=1500):
         self.max_context_files = max_context_files
         self.max_file_size = max_file_size
+        self.token_budget = token_budget
+        self.packer = ContextPacker()
     
     def discover_relevant_files(self, user_prompt):
         """Smart discovery of relevant files based on user prompt"""
@@ -38,13 +250,56 @@ class AgentUtils:
                     break
         
         return relevant_files
+
+    def pack_relevant_context(self, user_prompt, token_budget=None, within=None):
+        """
+        Token-budgeted discovery: only the chunks of candidate files most relevant to the prompt.
+        Files mentioned by path come first; within restricts candidates to one directory.
+        """
+        budget = token_budget if token_budget is not None else self.token_budget
+        # Most specific mentions first, so "pkg/render.py" claims its file before "render.py"
+        mentioned_files = sorted(self._extract_file_mentions(user_prompt), key=lambda m: (-m.count('/'), -len(m)))
+
+        candidates = []
+        for mention in mentioned_files:
+            if any(c == mention or c.endswith('/' + mention) for c in candidates):
+                continue
+            for match in self._find_matching_files(mention):
+                if match not in candidates and os.path.isfile(match):
+                    candidates.append(match)
+        for dir_hint in self._detect_directory_context(user_prompt):
+            if os.path.isdir(dir_hint):
+                for file in self._get_key_files_from_directory(dir_hint):
+                    if file not in candidates:
+                        candidates.append(file)
+                break
+
+        if within is not None:
+            prefix = os.path.abspath(within) + os.sep
+            candidates = [f for f in candidates if os.path.abspath(f).startswith(prefix)]
+        candidates = [f for f in candidates if os.path.getsize(f) <= 50000]
+        mentioned = [m for m in mentioned_files if any(c == m or c.endswith('/' + m) for c in candidates)]
+        return self.packer.pack(candidates, user_prompt, budget, mentioned)
+
+    def initial_context(self, user_prompt, working_directory, token_budget=None):
+        """Packed excerpts of the files relevant to the prompt, as text for the first message"""
+        packed = self.pack_relevant_context(user_prompt, token_budget, within=working_directory)
+        if not packed:
+            return ""
+        abs_working_directory = os.path.abspath(working_directory)
+        sections = [
+            f"## {os.path.relpath(os.path.abspath(file_path), abs_working_directory)}\n{text}"
+            for file_path, text in packed.items()
+        ]
+        return "Relevant excerpts from the working directory (read the full files before editing):\n\n" + "\n\n".join(sections)
     
     def _extract_file_mentions(self, text):
         """Extract potential file/directory mentions from text"""
-        mentions = set()
+        mentions = []
         
         # Common patterns for file mentions
         patterns = [
+            r'([\w.-]*\w/[\w./-]*\.\w+)\b',  # dir/sub/file.ext
             r'\b(\w+\.py)\b',           # filename.py
             r'\b(\w+/[\w/]*)\b',        # directory/path
             r'\b(in \w+)\b',            # "in calculator"
@@ -57,10 +312,10 @@ class AgentUtils:
             matches = re.findall(pattern, text, re.IGNORECASE)
             for match in matches:
                 clean_match = match.replace('in ', '').strip()
-                if clean_match:
-                    mentions.add(clean_match)
+                if clean_match and clean_match not in mentions:
+                    mentions.append(clean_match)
         
-        return list(mentions)
+        return mentions
     
     def _find_matching_files(self, mention):
         """Find actual files that match a mention (with fuzzy matching)"""
@@ -74,14 +329,18 @@ class AgentUtils:
                 # Get main files from directory
                 matches.extend(self._get_key_files_from_directory(mention))
         else:
-            # Fuzzy search
             all_files = []
-            for root, dirs, files in os.walk('.'):
-                # Skip hidden directories and common ignore patterns
-                dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['__pycache__', 'node_modules']]
-                for file in files:
-                    if not file.startswith('.') and file.endswith(('.py', '.txt', '.md', '.json')):
-                        all_files.append(os.path.join(root, file))
+            # Shared index skips hidden directories and common ignore patterns
+            for full_path in workspace_files('.'):
+                if full_path.endswith(('.py', '.txt', '.md', '.json')):
+                    all_files.append(os.path.relpath(full_path))
+            
+            # Exact path suffix matches win; among those, the shallowest (copies nested deeper are skipped)
+            mention_path = mention.strip('./')
+            exact = [f for f in all_files if f == mention_path or f.endswith('/' + mention_path)]
+            if exact:
+                depth = min(f.count('/') for f in exact)
+                return [f for f in exact if f.count('/') == depth]
             
             # Find close matches
             file_basenames = [os.path.basename(f) for f in all_files]
@@ -128,17 +387,15 @@ class AgentUtils:
         # Then add other Python files (limited)
         try:
             all_files = []
-            for root, dirs, files in os.walk(directory):
-                # Skip hidden directories
-                dirs[:] = [d for d in dirs if not d.startswith('.')]
-                for file in files:
-                    if file.endswith('.py') and not file.startswith('.'):
-                        full_path = os.path.join(root, file)
-                        if full_path not in key_files:
-                            all_files.append(full_path)
+            abs_directory = os.path.abspath(directory)
+            for indexed_path in workspace_files(abs_directory):
+                if indexed_path.endswith('.py'):
+                    full_path = os.path.join(directory, os.path.relpath(indexed_path, abs_directory))
+                    if full_path not in key_files:
+                        all_files.append(full_path)
             
-            # Sort by file size (smaller first, likely more important)
-            all_files.sort(key=lambda f: os.path.getsize(f) if os.path.exists(f) else 0)
+            # Shallow files first, then smaller ones (likely more important)
+            all_files.sort(key=lambda f: (f.count(os.sep), os.path.getsize(f) if os.path.exists(f) else 0))
             key_files.extend(all_files[:3])  # Add top 3
             
         except Exception as e:
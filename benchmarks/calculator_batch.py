@@ -0,0 +1,88 @@
+"""
+Throughput of batch formula evaluation in the calculator project.
+
+Builds a realistic formula set (many rows sharing constant factors such as
+`2 ^ 10 * x` and per-row coefficients) and compares:
+  - evaluate(): one Calculator.evaluate call per formula, variables substituted as text
+  - compile_batch() + evaluate(): folding and shared subexpressions, compiled per run
+  - evaluate() on an already compiled BatchProgram (new variable values only)
+
+Use a large --coefficients range to measure mostly-unique formula sets.
+
+Usage: python benchmarks/calculator_batch.py [--rows 20000] [--coefficients 50] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "calculator"))
+
+from pkg.calculator import Calculator  # noqa: E402
+
+TEMPLATES = [
+    "2 ^ 10 * x + {a} * y",
+    "2 ^ 10 * x - {a} / 4",
+    "3 * 4 + 5 * x * {a}",
+    "x * y + 2 ^ 10 * x",
+    "{a} * 1.5 + 100 / 8 - y",
+    "2 ^ 10 * x * y / {b}",
+]
+
+
+def build_formulas(rows, coefficients=50, seed=0):
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(a=rng.randint(1, coefficients), b=rng.randint(1, 9))
+        for _ in range(rows)
+    ]
+
+
+def substitute(formula, variables):
+    return " ".join(str(variables.get(token, token)) for token in formula.split())
+
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--coefficients", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    calculator = Calculator()
+    formulas = build_formulas(args.rows, args.coefficients)
+    variables = {"x": 3.0, "y": 7.0}
+
+    expected = [calculator.evaluate(substitute(f, variables)) for f in formulas]
+    program = calculator.compile_batch(formulas)
+    assert program.evaluate(variables) == expected, "batch results differ from evaluate()"
+
+    timings = {
+        "evaluate() per formula": best_time(
+            lambda: [calculator.evaluate(substitute(f, variables)) for f in formulas], args.repeat),
+        "compile_batch + evaluate": best_time(
+            lambda: calculator.compile_batch(formulas).evaluate(variables), args.repeat),
+        "precompiled evaluate": best_time(lambda: program.evaluate(variables), args.repeat),
+    }
+
+    dag = program.dag
+    print(f"{args.rows} formulas ({len(set(formulas))} distinct) -> {len(dag.nodes)} DAG nodes "
+          f"({dag.folded} folded, {dag.shared} shared)")
+    baseline = timings["evaluate() per formula"]
+    for name, seconds in timings.items():
+        print(f"  {name:26s} {args.rows / seconds:12,.0f} formulas/s  ({baseline / seconds:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Cold-start benchmark for the agent CLI.
+
+Runs `python -X importtime main.py` (the usage path, no model call) in a fresh
+interpreter, sums the cumulative import time of top-level imports and fails
+when it exceeds the budget or when the google.genai SDK gets imported.
+
+Usage: python benchmarks/startup_importtime.py [--budget-ms 150] [--runs 5] [--top 10]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_once():
+    """Return (total_us, imports) where imports maps module -> (self_us, cumulative_us)"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "main.py"],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    )
+    total = 0
+    imports = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = int(match[1]), int(match[2]), match[3], match[4]
+        imports[module] = (self_us, cumulative_us)
+        # Top-level imports are indented by a single space; nested ones are included in them
+        if len(indent) == 1:
+            total += cumulative_us
+    return total, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    totals = []
+    imports = {}
+    for _ in range(args.runs):
+        total, imports = measure_once()
+        totals.append(total)
+    best_ms = min(totals) / 1000
+
+    print(f"Startup import time (best of {args.runs}): {best_ms:.1f} ms (budget {args.budget_ms:.1f} ms)")
+    print("Slowest imports (cumulative, last run):")
+    slowest = sorted(imports.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    for module, (self_us, cumulative_us) in slowest:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    failures = []
+    eager_sdk = sorted(m for m in imports if m == "google.genai" or m.startswith("google.genai."))
+    if eager_sdk:
+        failures.append(f"google.genai imported at startup: {', '.join(eager_sdk[:5])}")
+    if best_ms > args.budget_ms:
+        failures.append(f"startup took {best_ms:.1f} ms, over the {args.budget_ms:.1f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
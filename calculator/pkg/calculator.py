@@ -1,3 +1,6 @@
+from pkg.optimizer import BatchProgram, ExpressionDAG, compile_tokens
+
+
 class Calculator:
     def __init__(self):
         self.operators = {
@@ -21,6 +24,29 @@ class Calculator:
         tokens = expression.strip().split()
         return self._evaluate_infix(tokens)
 
+    def compile_batch(self, expressions):
+        """
+        Compile many expressions into one shared DAG: constants are folded and
+        identical subexpressions are evaluated once per evaluation. Identifiers
+        in expressions are variables supplied to BatchProgram.evaluate.
+        """
+        dag = ExpressionDAG(self.operators)
+        roots = []
+        compiled = {}
+        for expression in expressions:
+            if not expression or expression.isspace():
+                roots.append(None)
+                continue
+            root = compiled.get(expression)
+            if root is None:
+                tokens = expression.strip().split()
+                root = compiled[expression] = compile_tokens(tokens, self.operators, self.precedence, dag)
+            roots.append(root)
+        return BatchProgram(dag, roots)
+
+    def evaluate_batch(self, expressions, variables=None):
+        return self.compile_batch(expressions).evaluate(variables)
+
     def _evaluate_infix(self, tokens):
         values = []
         operators = []
@@ -0,0 +1,165 @@
+import math
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+class ExpressionDAG:
+    """
+    Hash-consed expression graph shared by a batch of formulas.
+    Identical subtrees become one node, constant subtrees are folded when the
+    node is built, and every node is evaluated at most once per evaluation.
+    Nodes are stored in creation order, which is also a valid evaluation order.
+    """
+
+    def __init__(self, operators):
+        self.operators = operators
+        self.nodes = []
+        self._index = {}
+        self._leaves = {}
+        self.folded = 0
+        self.shared = 0
+
+    def _intern(self, key, node):
+        node_id = self._index.get(key)
+        if node_id is not None:
+            self.shared += 1
+            return node_id
+        node_id = len(self.nodes)
+        self.nodes.append(node)
+        self._index[key] = node_id
+        return node_id
+
+    def const(self, value):
+        # copysign keeps 0.0 and -0.0 apart, which compare equal
+        return self._intern(("const", value, math.copysign(1.0, value)), ("const", value))
+
+    def var(self, name):
+        return self._intern(("var", name), ("var", name))
+
+    def leaf(self, token):
+        """Node for a number or variable token, memoized by token text"""
+        node_id = self._leaves.get(token)
+        if node_id is None:
+            try:
+                node_id = self.const(float(token))
+            except ValueError:
+                if not token.isidentifier():
+                    raise ValueError("Invalid token: {}".format(token))
+                node_id = self.var(token)
+            self._leaves[token] = node_id
+        else:
+            self.shared += 1
+        return node_id
+
+    def apply(self, operator, left, right):
+        left_node, right_node = self.nodes[left], self.nodes[right]
+        if left_node[0] == "const" and right_node[0] == "const":
+            try:
+                value = self.operators[operator](left_node[1], right_node[1])
+            except (ArithmeticError, ValueError):
+                value = None  # Leave the node in place so the error surfaces at evaluation
+            if isinstance(value, float):
+                self.folded += 1
+                return self.const(value)
+        return self._intern((operator, left, right), (operator, left, right))
+
+    def schedule(self, roots):
+        """Ids of the nodes the roots depend on, in evaluation order"""
+        needed = bytearray(len(self.nodes))
+        stack = [root for root in roots if root is not None]
+        while stack:
+            node_id = stack.pop()
+            if needed[node_id]:
+                continue
+            needed[node_id] = 1
+            node = self.nodes[node_id]
+            if node[0] != "const" and node[0] != "var":
+                stack.append(node[1])
+                stack.append(node[2])
+        return [node_id for node_id in range(len(self.nodes)) if needed[node_id]]
+
+    def evaluate(self, roots, variables=None, schedule=None):
+        """Values of the given root nodes (None roots evaluate to None)"""
+        variables = variables or {}
+        nodes = self.nodes
+        operators = self.operators
+        values = [None] * len(nodes)
+        for node_id in (self.schedule(roots) if schedule is None else schedule):
+            kind, a, *rest = nodes[node_id]
+            if kind == "const":
+                values[node_id] = a
+            elif kind == "var":
+                if a in variables:
+                    values[node_id] = float(variables[a])
+                else:
+                    values[node_id] = _Failure(ValueError("Invalid token: {}".format(a)))
+            else:
+                left, right = values[a], values[rest[0]]
+                if isinstance(left, _Failure):
+                    values[node_id] = left
+                elif isinstance(right, _Failure):
+                    values[node_id] = right
+                else:
+                    try:
+                        values[node_id] = operators[kind](left, right)
+                    except Exception as e:
+                        values[node_id] = _Failure(e)
+
+        results = []
+        for root in roots:
+            value = None if root is None else values[root]
+            if isinstance(value, _Failure):
+                raise value.error
+            results.append(value)
+        return results
+
+
+class BatchProgram:
+    """A batch of compiled expressions that can be evaluated repeatedly"""
+
+    def __init__(self, dag, roots):
+        self.dag = dag
+        self.roots = roots
+        self._schedule = None
+
+    def evaluate(self, variables=None):
+        if self._schedule is None:
+            self._schedule = self.dag.schedule(self.roots)
+        return self.dag.evaluate(self.roots, variables, self._schedule)
+
+
+def compile_tokens(tokens, operators, precedence, dag):
+    """
+    Compile infix tokens into a node of dag using the same operator-precedence
+    rules as Calculator._evaluate_infix. Identifiers become variables.
+    """
+    values = []
+    stack = []
+
+    def apply_operator():
+        operator = stack.pop()
+        if len(values) < 2:
+            raise ValueError("Not enough operands for operator: {}".format(operator))
+        right = values.pop()
+        left = values.pop()
+        values.append(dag.apply(operator, left, right))
+
+    for token in tokens:
+        if token in operators:
+            while (
+                stack
+                and stack[-1] in operators
+                and precedence[stack[-1]] >= precedence[token]
+            ):
+                apply_operator()
+            stack.append(token)
+        else:
+            values.append(dag.leaf(token))
+
+    while stack:
+        apply_operator()
+
+    return values[0] if values else None
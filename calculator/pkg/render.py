@@ -1,8 +1,11 @@
-def render(expression, result):
+def format_result(result):
     if isinstance(result, float) and result.is_integer():
-        result_str = str(int(result))
-    else:
-        result_str = str(result)
+        return str(int(result))
+    return str(result)
+
+
+def render(expression, result):
+    result_str = format_result(result)
 
     box_width = max(len(expression), len(result_str)) + 4
 
@@ -18,4 +21,75 @@ def render(expression, result):
         "│" + " " * 2 + result_str + " " * (box_width - len(result_str) - 2) + "│"
     )
     box.append("└" + "─" * box_width + "┘")
-    return "\n".join(box)
\ No newline at end of file
+    return "\n".join(box)
+
+
+def _format_rows(pairs):
+    rows = [(expression, format_result(result)) for expression, result in pairs]
+    expr_width = max((len(expression) for expression, _ in rows), default=0)
+    result_width = max((len(result_str) for _, result_str in rows), default=0)
+    return rows, expr_width, result_width
+
+
+def _emit(text, out):
+    if out is None:
+        return text
+    out.write(text)
+    out.write("\n")
+    return None
+
+
+def render_many(pairs, out=None):
+    """
+    Render many (expression, result) pairs as boxes of one shared width.
+    Border and filler strings are built once for the whole batch and the
+    output is produced with a single join; pass a file-like `out` to write
+    it in one call instead of returning it.
+    """
+    rows, expr_width, result_width = _format_rows(pairs)
+    if not rows:
+        return _emit("", out)
+
+    box_width = max(expr_width, result_width) + 4
+    top = "┌" + "─" * box_width + "┐"
+    blank = "│" + " " * box_width + "│"
+    equals = "│" + " " * 2 + "=" + " " * (box_width - 3) + "│"
+    bottom = "└" + "─" * box_width + "┘"
+    inner = box_width - 2
+
+    lines = []
+    for expression, result_str in rows:
+        lines.extend((
+            top,
+            "│  " + expression.ljust(inner) + "│",
+            blank,
+            equals,
+            blank,
+            "│  " + result_str.ljust(inner) + "│",
+            bottom,
+        ))
+    return _emit("\n".join(lines), out)
+
+
+def render_table(pairs, out=None):
+    """
+    Render many (expression, result) pairs as a compact two-column table,
+    one row per pair with results right-aligned.
+    """
+    rows, expr_width, result_width = _format_rows(pairs)
+    expr_width = max(expr_width, len("Expression"))
+    result_width = max(result_width, len("Result"))
+
+    expr_rule = "─" * (expr_width + 2)
+    result_rule = "─" * (result_width + 2)
+    lines = [
+        "┌" + expr_rule + "┬" + result_rule + "┐",
+        "│ " + "Expression".ljust(expr_width) + " │ " + "Result".rjust(result_width) + " │",
+        "├" + expr_rule + "┼" + result_rule + "┤",
+    ]
+    lines.extend(
+        "│ " + expression.ljust(expr_width) + " │ " + result_str.rjust(result_width) + " │"
+        for expression, result_str in rows
+    )
+    lines.append("└" + expr_rule + "┴" + result_rule + "┘")
+    return _emit("\n".join(lines), out)
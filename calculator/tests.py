@@ -1,7 +1,9 @@
 # tests.py
 
+import io
 import unittest
 from pkg.calculator import Calculator
+from pkg.render import render, render_many, render_table
 
 
 class TestCalculator(unittest.TestCase):
@@ -45,5 +47,59 @@ class TestCalculator(unittest.TestCase):
             self.calculator.evaluate("+ 3")
 
 
+class TestBatchEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.calculator = Calculator()
+
+    def test_matches_evaluate(self):
+        expressions = ["3 + 5", "10 - 4", "3 * 4 + 5", "2 * 3 - 8 / 2 + 5", "2 ^ 3 ^ 2", ""]
+        expected = [self.calculator.evaluate(e) for e in expressions]
+        self.assertEqual(self.calculator.evaluate_batch(expressions), expected)
+
+    def test_constants_are_folded(self):
+        program = self.calculator.compile_batch(["2 ^ 10 * 3"])
+        self.assertEqual(program.dag.nodes[program.roots[0]], ("const", 3072.0))
+
+    def test_shared_subexpressions(self):
+        program = self.calculator.compile_batch(["2 ^ 10 * x + 1", "2 ^ 10 * x + y", "2 ^ 10 * x"])
+        self.assertEqual(program.roots[2], program.dag.nodes[program.roots[0]][1])
+        self.assertEqual(program.evaluate({"x": 2, "y": 3}), [2049.0, 2051.0, 2048.0])
+
+    def test_unbound_variable(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_batch(["x + 1"])
+
+    def test_division_by_zero_is_not_folded_away(self):
+        program = self.calculator.compile_batch(["1 + 2", "1 / 0"])
+        with self.assertRaises(ZeroDivisionError):
+            program.evaluate()
+
+    def test_invalid_operator(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_batch(["$ 3 5"])
+
+
+class TestRender(unittest.TestCase):
+    def test_render_many_matches_render_for_single_pair(self):
+        self.assertEqual(render_many([("3 + 5", 8.0)]), render("3 + 5", 8.0))
+
+    def test_render_many_shares_width(self):
+        lines = render_many([("3 + 5", 8.0), ("10 * 10 - 1", 99.0)]).split("\n")
+        self.assertEqual(len(lines), 14)
+        self.assertEqual(len({len(line) for line in lines}), 1)
+
+    def test_render_many_writes_to_out(self):
+        out = io.StringIO()
+        self.assertIsNone(render_many([("3 + 5", 8.0)], out=out))
+        self.assertEqual(out.getvalue(), render("3 + 5", 8.0) + "\n")
+
+    def test_render_table(self):
+        table = render_table([("3 + 5", 8.0), ("10 / 4", 2.5)])
+        lines = table.split("\n")
+        self.assertEqual(len(lines), 6)
+        self.assertIn("│ 3 + 5      │      8 │", lines)
+        self.assertIn("│ 10 / 4     │    2.5 │", lines)
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,20 +1,28 @@
-from google.genai import types
 from functions.get_files_info import get_files_info
 from functions.get_file_contents import get_file_content
+from functions.get_files_content import get_files_content
 from functions.write_file import write_file
+from functions.write_files import write_files
 from functions.run_python_file import run_python_file
+from functions.run_affected_tests import run_affected_tests
 import os
-import glob
 import difflib
+import time
 from pathlib import Path
+from workspace_watcher import workspace_files
+from prefetcher import prefetcher
+from run_analytics import recorder
 
 WORKING_DIRECTORY = "calculator"  # Keep your original hardcoded value
 
 function_map = {
     "get_files_info": get_files_info,
     "get_file_content": get_file_content,
+    "get_files_content": get_files_content,
     "write_file": write_file,
+    "write_files": write_files,
     "run_python_file": run_python_file,
+    "run_affected_tests": run_affected_tests,
 }
 
 def smart_file_search(filename, working_directory=WORKING_DIRECTORY, max_matches=3):
@@ -27,29 +35,25 @@ def smart_file_search(filename, working_directory=WORKING_DIRECTORY, max_matches
     # If it's already a valid path, return it
     full_path = os.path.join(working_directory, filename)
     if os.path.exists(full_path):
+        recorder.record_path_resolution("direct")
         return filename
     
     matches = []
+    # Shared file index: kept current by the workspace watcher when one runs, rescanned otherwise
+    abs_working_directory = os.path.abspath(working_directory)
+    all_files = [
+        (os.path.relpath(full_file_path, abs_working_directory), os.path.basename(full_file_path))
+        for full_file_path in workspace_files(abs_working_directory)
+    ]
     
     # 1. Exact filename search in all subdirectories
     if "/" not in filename:
-        exact_matches = glob.glob(os.path.join(working_directory, "**", filename), recursive=True)
-        for match in exact_matches:
-            rel_path = os.path.relpath(match, working_directory)
-            matches.append((rel_path, 1.0, "exact"))
+        for rel_path, basename in all_files:
+            if basename == filename:
+                matches.append((rel_path, 1.0, "exact"))
     
     # 2. Fuzzy search if no exact matches
     if not matches:
-        all_files = []
-        for root, dirs, files in os.walk(working_directory):
-            # Skip hidden directories and common ignore patterns
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['__pycache__', 'node_modules']]
-            for file in files:
-                if not file.startswith('.'):
-                    full_file_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(full_file_path, working_directory)
-                    all_files.append((rel_path, file))
-        
         # Get close matches for just the filename
         base_filename = os.path.basename(filename)
         file_basenames = [f[1] for f in all_files]
@@ -62,13 +66,16 @@ def smart_file_search(filename, working_directory=WORKING_DIRECTORY, max_matches
                     matches.append((rel_path, similarity, "fuzzy"))
                     break
     
-    # 3. Sort by priority: exact matches first, then by similarity
+    # 3. Sort by priority: exact matches first, then by similarity, then shallowest path
+    matches.sort(key=lambda x: x[0].count(os.sep))
     matches.sort(key=lambda x: (x[2] == "exact", x[1]), reverse=True)
     
     if matches:
-        best_match = matches[0][0]
+        best_match, _, outcome = matches[0]
+        recorder.record_path_resolution(outcome)
         return best_match
     
+    recorder.record_path_resolution("unresolved")
     return filename  # Return original if no matches found
 
 def resolve_file_path(filename, working_directory=WORKING_DIRECTORY):
@@ -130,6 +137,23 @@ def validate_and_enhance_args(function_name, args, working_directory=WORKING_DIR
             normalized = normalize_path_arg(enhanced_args["file_path"])
             enhanced_args["file_path"] = resolve_file_path(normalized)
     
+    elif function_name == "get_files_content":
+        file_paths = enhanced_args.get("file_paths") or []
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        enhanced_args["file_paths"] = [resolve_file_path(normalize_path_arg(p)) for p in file_paths]
+        if enhanced_args.get("pattern"):
+            enhanced_args["pattern"] = normalize_path_arg(enhanced_args["pattern"])
+    
+    elif function_name == "write_files":
+        files = enhanced_args.get("files") or []
+        # Batches usually create new files, so paths are normalized but not fuzzy-resolved
+        enhanced_args["files"] = [
+            dict(entry, file_path=normalize_path_arg(entry["file_path"]))
+            if isinstance(entry, dict) and isinstance(entry.get("file_path"), str) else entry
+            for entry in files
+        ]
+    
     elif function_name == "run_python_file":
         if "file_path" in enhanced_args:
             normalized = normalize_path_arg(enhanced_args["file_path"])
@@ -154,6 +178,8 @@ def format_function_result(function_name, result, success=True):
     """
     Format function results consistently
     """
+    from google.genai import types
+
     if success:
         return types.Content(
             role="tool",
@@ -217,8 +243,19 @@ def call_function(function_call_part, verbose=False):
         return format_function_result(function_name, error_msg, success=False)
     
     # Execute function with error handling
+    started = time.monotonic()
     try:
         result = func(**args)
+        recorder.record_tool_call(
+            function_name,
+            time.monotonic() - started,
+            error=isinstance(result, str) and result.startswith("Error"),
+        )
+        
+        # Warm the read cache with the files the model is likely to read next
+        prefetched = prefetcher.after_call(function_name, args, result)
+        if verbose and prefetched:
+            print(f"  Prefetching: {[os.path.relpath(p, os.path.abspath(WORKING_DIRECTORY)) for p in prefetched]}")
         
         # Post-process result if needed
         if function_name == "get_files_info" and isinstance(result, str):
@@ -232,6 +269,7 @@ def call_function(function_call_part, verbose=False):
         return format_function_result(function_name, result, success=True)
         
     except Exception as e:
+        recorder.record_tool_call(function_name, time.monotonic() - started, error=True)
         error_msg = f"{type(e).__name__}: {e}"
         if verbose:
             print(f"Error executing {function_name}: {error_msg}")
@@ -1 +1,9 @@
 MAX_CHARS = 10000
+MAX_TOTAL_CHARS = 30000
+MAX_FILES_PER_READ = 50
+MAX_FILES_PER_WRITE = 50
+
+# run_python_file limits; set a limit to None to disable it
+RUN_TIMEOUT_SECONDS = 30
+RUN_CPU_LIMIT_SECONDS = 30
+RUN_MEMORY_LIMIT_BYTES = 2 * 1024 ** 3
@@ -0,0 +1,173 @@
+import ast
+import os
+from workspace_watcher import subscribe, workspace_files
+
+
+def is_test_file(rel_path):
+    name = os.path.basename(rel_path)
+    return name.endswith(".py") and (name.startswith("test") or name.endswith("tests.py") or name.endswith("_test.py"))
+
+
+def parse_imports(source, filename="<unknown>"):
+    """
+    Return the imports of a Python source as (module, names, level) tuples.
+    `names` holds the imported names for `from` imports and is empty otherwise.
+    """
+    tree = ast.parse(source, filename=filename)
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append((alias.name, (), 0))
+        elif isinstance(node, ast.ImportFrom):
+            imports.append((node.module or "", tuple(alias.name for alias in node.names), node.level))
+    return imports
+
+
+def module_to_path(abs_root, base_dir, module):
+    """Find the file for a dotted module name under base_dir, or None"""
+    if not module:
+        candidate = os.path.join(base_dir, "__init__.py")
+        return candidate if os.path.isfile(candidate) else None
+    parts = module.split(".")
+    candidates = [
+        os.path.join(base_dir, *parts) + ".py",
+        os.path.join(base_dir, *parts, "__init__.py"),
+    ]
+    for candidate in candidates:
+        if os.path.isfile(candidate) and os.path.abspath(candidate).startswith(abs_root):
+            return os.path.abspath(candidate)
+    return None
+
+
+def import_search_dirs(abs_root, abs_file_path):
+    """Directories a script run from the working directory can import from"""
+    script_dir = os.path.dirname(abs_file_path)
+    return [script_dir] if script_dir == abs_root else [script_dir, abs_root]
+
+
+def resolve_import(abs_root, abs_file_path, module, names=(), level=0):
+    """
+    Resolve one import statement to the local files it loads.
+    Returns a list of absolute paths; imports that are not local resolve to [].
+    """
+    if level:
+        base_dir = os.path.dirname(abs_file_path)
+        for _ in range(level - 1):
+            base_dir = os.path.dirname(base_dir)
+        search_dirs = [base_dir]
+    else:
+        search_dirs = import_search_dirs(abs_root, abs_file_path)
+
+    for base_dir in search_dirs:
+        module_path = module_to_path(abs_root, base_dir, module)
+        submodule_paths = []
+        for name in names:
+            full_name = f"{module}.{name}" if module else name
+            submodule_path = module_to_path(abs_root, base_dir, full_name)
+            if submodule_path:
+                submodule_paths.append(submodule_path)
+        if module_path or submodule_paths:
+            return ([module_path] if module_path else []) + submodule_paths
+    return []
+
+
+class DependencyTracker:
+    """
+    Import graph of a working directory, used to find the test files affected
+    by files written since the last test run. Parsed imports are cached per
+    file mtime so rebuilding the graph only re-parses changed files.
+    """
+
+    def __init__(self, working_directory):
+        self.working_directory = working_directory
+        self.abs_root = os.path.abspath(working_directory)
+        self.changed_files = set()
+        self._imports_cache = {}
+        subscribe(self._on_changes)
+
+    def _on_changes(self, events):
+        for event in events:
+            if not event.path.startswith(self.abs_root):
+                continue
+            if event.kind == "modified" and not event.is_dir:
+                self._imports_cache.pop(event.path, None)
+            else:
+                # New or removed files can change how any import resolves
+                self._imports_cache.clear()
+                return
+
+    def record_write(self, file_path):
+        abs_file_path = os.path.abspath(os.path.join(self.abs_root, file_path.lstrip("/")))
+        self.changed_files.add(abs_file_path)
+
+    def clear_changes(self):
+        self.changed_files.clear()
+
+    def python_files(self):
+        return [path for path in workspace_files(self.abs_root) if path.endswith(".py")]
+
+    def local_imports(self, abs_file_path):
+        """Local files imported directly by abs_file_path"""
+        try:
+            mtime = os.path.getmtime(abs_file_path)
+        except OSError:
+            return []
+        cached = self._imports_cache.get(abs_file_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            with open(abs_file_path, "r", encoding="utf-8", errors="replace") as f:
+                imports = parse_imports(f.read(), abs_file_path)
+        except (SyntaxError, ValueError):
+            imports = []
+        deps = []
+        for module, names, level in imports:
+            for dep in resolve_import(self.abs_root, abs_file_path, module, names, level):
+                if dep != abs_file_path and dep not in deps:
+                    deps.append(dep)
+        self._imports_cache[abs_file_path] = (mtime, deps)
+        return deps
+
+    def transitive_imports(self, abs_file_path):
+        seen = set()
+        stack = [abs_file_path]
+        while stack:
+            current = stack.pop()
+            for dep in self.local_imports(current):
+                if dep not in seen:
+                    seen.add(dep)
+                    stack.append(dep)
+        return seen
+
+    def test_dependencies(self):
+        """Map each test file (relative path) to the local files it imports"""
+        graph = {}
+        for abs_file_path in self.python_files():
+            rel_path = os.path.relpath(abs_file_path, self.abs_root)
+            if is_test_file(rel_path):
+                graph[rel_path] = self.transitive_imports(abs_file_path)
+        return graph
+
+    def affected_tests(self, changed_files=None):
+        """Relative paths of the test files impacted by the changed files"""
+        changed = self.changed_files if changed_files is None else changed_files
+        affected = []
+        for rel_path, deps in sorted(self.test_dependencies().items()):
+            abs_test_path = os.path.join(self.abs_root, rel_path)
+            if abs_test_path in changed or deps & changed:
+                affected.append(rel_path)
+        return affected
+
+
+_trackers = {}
+
+
+def get_tracker(working_directory):
+    """Shared tracker for a working directory, so writes and test runs see the same state"""
+    abs_root = os.path.abspath(working_directory)
+    tracker = _trackers.get(abs_root)
+    if tracker is None:
+        tracker = _trackers[abs_root] = DependencyTracker(working_directory)
+    return tracker
@@ -1,20 +1,21 @@
 import os
 from .config import MAX_CHARS
-from google.genai import types
+from .read_cache import read_cache
+from .registry import register_schema
 
-schema_get_file_content = types.FunctionDeclaration(
-    name="get_file_content",
-    description="Get the contents of a file within the working directory, with truncation and error handling.",
-    parameters=types.Schema(
-        type="object",
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The path to the file to read, relative to the working directory."
-            ),
+schema_get_file_content = register_schema({
+    "name": "get_file_content",
+    "description": "Get the contents of a file within the working directory, with truncation and error handling.",
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "file_path": {
+                "type": "STRING",
+                "description": "The path to the file to read, relative to the working directory."
+            },
         },
-    ),
-)
+    },
+})
 
 def get_file_content(working_directory, file_path):
 	abs_working_directory = os.path.abspath(working_directory)
@@ -24,8 +25,7 @@ def get_file_content(working_directory, file_path):
 	if not os.path.isfile(abs_file_path):
 		return f'Error: File not found or is not a regular file: "{file_path}"'
 	try:
-		with open(abs_file_path, "r", encoding="utf-8", errors="replace") as f:
-			content = f.read(MAX_CHARS + 1)
+		content = read_cache.read(abs_file_path, MAX_CHARS + 1)
 		if len(content) >= MAX_CHARS:
 			content = content[:MAX_CHARS] + f'\n[...File "{file_path}" truncated at {MAX_CHARS} characters]'
 		return content
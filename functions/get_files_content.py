@@ -0,0 +1,118 @@
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+from .config import MAX_FILES_PER_READ, MAX_TOTAL_CHARS
+from .read_cache import read_cache
+from .registry import register_schema
+
+SKIP_DIRS = {"__pycache__", "node_modules"}
+
+
+def _expand_pattern(abs_working_directory, pattern):
+    matches = glob.glob(os.path.join(abs_working_directory, pattern.lstrip("/")), recursive=True)
+    paths = []
+    for match in sorted(matches):
+        rel_path = os.path.relpath(match, abs_working_directory)
+        parts = rel_path.split(os.sep)
+        if any(part.startswith(".") or part in SKIP_DIRS for part in parts):
+            continue
+        if os.path.isfile(match):
+            paths.append(rel_path)
+    return paths
+
+
+def allocate_budget(sizes, total_budget):
+    """
+    Split a character budget across files: small files get what they need and
+    the remainder is shared evenly among the larger ones.
+    """
+    allocations = [0] * len(sizes)
+    remaining = total_budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for position, index in enumerate(order):
+        share = remaining // (len(order) - position)
+        allocations[index] = min(sizes[index], share)
+        remaining -= allocations[index]
+    return allocations
+
+
+def _read_prefix(abs_file_path, limit):
+    return read_cache.read(abs_file_path, limit + 1)
+
+
+def get_files_content(working_directory, file_paths=None, pattern=None, max_total_chars=MAX_TOTAL_CHARS):
+    """
+    Read several files within the working_directory in one call, given as a list
+    of paths and/or a glob pattern. Files are read concurrently and share one
+    total character budget instead of MAX_CHARS each.
+    Returns a dict with the files read, per-path errors and the characters used.
+    """
+    abs_working_directory = os.path.abspath(working_directory)
+    requested = list(file_paths or [])
+    if pattern:
+        requested.extend(p for p in _expand_pattern(abs_working_directory, pattern) if p not in requested)
+    if not requested:
+        return f'Error: No files matched {"pattern " + repr(pattern) if pattern else "the request"}'
+
+    errors = []
+    if len(requested) > MAX_FILES_PER_READ:
+        errors.append(f"Only the first {MAX_FILES_PER_READ} of {len(requested)} files were read")
+        requested = requested[:MAX_FILES_PER_READ]
+
+    readable = []
+    for file_path in requested:
+        abs_file_path = os.path.abspath(os.path.join(abs_working_directory, file_path.lstrip("/")))
+        if not abs_file_path.startswith(abs_working_directory):
+            errors.append(f'Cannot read "{file_path}" as it is outside the permitted working directory')
+        elif not os.path.isfile(abs_file_path):
+            errors.append(f'File not found or is not a regular file: "{file_path}"')
+        else:
+            readable.append((file_path, abs_file_path, os.path.getsize(abs_file_path)))
+
+    allocations = allocate_budget([size for _, _, size in readable], max_total_chars)
+    with ThreadPoolExecutor(max_workers=min(8, len(readable) or 1)) as executor:
+        futures = [
+            executor.submit(_read_prefix, abs_file_path, limit)
+            for (_, abs_file_path, _), limit in zip(readable, allocations)
+        ]
+
+    files = []
+    total_chars = 0
+    for (file_path, _, size), limit, future in zip(readable, allocations, futures):
+        try:
+            content = future.result()
+        except Exception as e:
+            errors.append(f'Error reading "{file_path}": {type(e).__name__}: {e}')
+            continue
+        truncated = len(content) > limit
+        if truncated:
+            content = content[:limit]
+        total_chars += len(content)
+        files.append({"path": file_path, "content": content, "truncated": truncated, "size": size})
+
+    return {
+        "files": files,
+        "errors": errors,
+        "total_chars": total_chars,
+        "max_total_chars": max_total_chars,
+    }
+
+
+schema_get_files_content = register_schema({
+    "name": "get_files_content",
+    "description": "Read several files within the working directory in one call, given as a list of paths and/or a glob pattern. All files share one total character budget.",
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "file_paths": {
+                "type": "ARRAY",
+                "items": {"type": "STRING"},
+                "description": "Paths of the files to read, relative to the working directory.",
+            },
+            "pattern": {
+                "type": "STRING",
+                "description": "Optional glob pattern relative to the working directory, e.g. 'pkg/*.py' or '**/*.py'.",
+            },
+        },
+    },
+})
@@ -1,5 +1,50 @@
-from google.genai import types
+from .registry import register_schema
 import os
+import threading
+from workspace_watcher import is_staging_file, is_watched, subscribe
+
+# Directory listings reused while a workspace watcher keeps them current
+_listing_cache = {}
+_listing_lock = threading.Lock()
+
+
+@subscribe
+def _invalidate_listings(events):
+    with _listing_lock:
+        for event in events:
+            if event.kind == "rescan":
+                for directory in [d for d in _listing_cache if d == event.path or d.startswith(event.path + os.sep)]:
+                    _listing_cache.pop(directory, None)
+                continue
+            _listing_cache.pop(os.path.dirname(event.path), None)
+            if event.is_dir:
+                _listing_cache.pop(event.path, None)
+
+
+def _list_directory(abs_directory):
+    """(name, is_dir, size) entries of a directory, cached while it is watched"""
+    watched = is_watched(abs_directory)
+    with _listing_lock:
+        if watched:
+            entries = _listing_cache.get(abs_directory)
+        else:
+            # Listings cached under a watcher that has since stopped are no longer kept current
+            entries = None
+            _listing_cache.pop(abs_directory, None)
+    if entries is not None:
+        return entries
+    entries = []
+    for content in os.listdir(abs_directory):
+        if is_staging_file(content):
+            continue
+        content_path = os.path.join(abs_directory, content)
+        is_dir = os.path.isdir(content_path)
+        size = os.path.getsize(content_path) if not is_dir else 0
+        entries.append((content, is_dir, size))
+    if watched:
+        with _listing_lock:
+            _listing_cache[abs_directory] = entries
+    return entries
 
 
 def get_files_info(working_directory, directory="."):
@@ -10,28 +55,25 @@ def get_files_info(working_directory, directory="."):
 
     final_response = ""
     try:
-        contents = os.listdir(abs_directory)
+        entries = _list_directory(abs_directory)
     except FileNotFoundError:
         return f"Directory not found: {abs_directory}"
-    for content in contents:
-        content_path = os.path.join(abs_directory, content)
-        is_dir = os.path.isdir(content_path)
-        size = os.path.getsize(content_path) if not is_dir else 0
+    for content, is_dir, size in entries:
         final_response += f"{content} - {'Directory' if is_dir else 'File'} - {size} bytes\n"
         print(f"Found {'directory' if is_dir else 'file'}: {content} - {size} bytes")
     return final_response
 
 
-schema_get_files_info = types.FunctionDeclaration(
-    name="get_files_info",
-    description="Get a list of files and directories in the specified directory within the working directory.",
-    parameters=types.Schema(
-        type="object",
-        properties={
-            "directory": types.Schema(
-                type=types.Type.STRING,
-                description="The directory to list files from, relative to the working directory. Use '.' for the root of the working directory."
-            ),
+schema_get_files_info = register_schema({
+    "name": "get_files_info",
+    "description": "Get a list of files and directories in the specified directory within the working directory.",
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "directory": {
+                "type": "STRING",
+                "description": "The directory to list files from, relative to the working directory. Use '.' for the root of the working directory."
+            },
         },
-    ),
-)
\ No newline at end of file
+    },
+})
\ No newline at end of file
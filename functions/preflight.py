@@ -0,0 +1,191 @@
+import ast
+import os
+from .dependency_tracker import import_search_dirs, module_to_path
+
+# Calls that can add module globals the ast cannot see
+DYNAMIC_NAMESPACE_CALLS = {"globals", "vars", "exec", "setattr"}
+# except clauses that make a failing import in their try block an intended fallback
+IMPORT_FALLBACK_EXCEPTIONS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+
+
+def defined_names(tree):
+    """
+    Top-level names a module defines, or None when they cannot be known
+    statically (star imports, a dynamic __getattr__, or globals()/vars()/exec).
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Global):
+            # Bound from inside a function
+            names.update(node.names)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in DYNAMIC_NAMESPACE_CALLS:
+            return None
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if node.name == "__getattr__":
+                return None
+            names.add(node.name)
+        elif isinstance(node, ast.TypeAlias):
+            names.add(node.name.id)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == "*":
+                    return None
+                names.add(alias.asname or alias.name.split(".")[0])
+        else:
+            # Assignments, loops, with/try/match blocks and walrus expressions:
+            # collect every name they bind without being strict about which branch runs
+            for sub in ast.walk(node):
+                if isinstance(sub, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    names.add(sub.name)
+                elif isinstance(sub, ast.Name) and isinstance(sub.ctx, ast.Store):
+                    names.add(sub.id)
+                elif isinstance(sub, (ast.MatchAs, ast.MatchStar)) and sub.name:
+                    names.add(sub.name)
+                elif isinstance(sub, ast.MatchMapping) and sub.rest:
+                    names.add(sub.rest)
+                elif isinstance(sub, ast.ExceptHandler) and sub.name:
+                    names.add(sub.name)
+                elif isinstance(sub, (ast.Import, ast.ImportFrom)):
+                    for alias in sub.names:
+                        if alias.name == "*":
+                            return None
+                        names.add(alias.asname or alias.name.split(".")[0])
+    return names
+
+
+def _catches_import_error(handler):
+    if handler.type is None:
+        return True
+    types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+    return any(
+        (isinstance(t, ast.Name) and t.id in IMPORT_FALLBACK_EXCEPTIONS)
+        or (isinstance(t, ast.Attribute) and t.attr in IMPORT_FALLBACK_EXCEPTIONS)
+        for t in types
+    )
+
+
+def _is_type_checking(test):
+    return (isinstance(test, ast.Name) and test.id == "TYPE_CHECKING") or (
+        isinstance(test, ast.Attribute) and test.attr == "TYPE_CHECKING"
+    )
+
+
+def guarded_imports(tree):
+    """
+    Import nodes that are allowed to fail: inside a try whose handlers catch
+    ImportError, or under `if TYPE_CHECKING:`, which never runs.
+    """
+    guarded = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Try, ast.TryStar)) and any(_catches_import_error(h) for h in node.handlers):
+            body = node.body
+        elif isinstance(node, ast.If) and _is_type_checking(node.test):
+            body = node.body
+        else:
+            continue
+        for statement in body:
+            for sub in ast.walk(statement):
+                if isinstance(sub, (ast.Import, ast.ImportFrom)):
+                    guarded.add(id(sub))
+    return guarded
+
+
+def _module_names(path, staged):
+    try:
+        if path in staged:
+            return defined_names(ast.parse(staged[path], filename=path))
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return defined_names(ast.parse(f.read(), filename=path))
+    except (SyntaxError, ValueError, OSError):
+        return None
+
+
+def _find_module(abs_root, base_dir, module, staged):
+    """module_to_path that also sees files staged in the same batch"""
+    module_path = module_to_path(abs_root, base_dir, module)
+    if module_path or not staged:
+        return module_path
+    parts = module.split(".") if module else []
+    candidates = [os.path.join(base_dir, *parts) + ".py"] if parts else []
+    candidates.append(os.path.join(base_dir, *parts, "__init__.py"))
+    return next((os.path.abspath(c) for c in candidates if os.path.abspath(c) in staged), None)
+
+
+def _is_dir(path, staged):
+    return os.path.isdir(path) or any(p.startswith(path + os.sep) for p in staged)
+
+
+def _is_local(abs_root, search_dirs, top_level, staged):
+    for base_dir in search_dirs:
+        if _find_module(abs_root, base_dir, top_level, staged) or _is_dir(os.path.join(base_dir, top_level), staged):
+            return True
+    return False
+
+
+def check_python_source(working_directory, file_path, content, staged=None):
+    """
+    Compile Python content in-process and check its local imports against the
+    working directory before it is written.
+    staged maps absolute paths to contents about to be written alongside this
+    file (see write_files), so imports between them resolve.
+    Returns a list of error strings, empty when the content looks runnable.
+    """
+    staged = staged or {}
+    abs_root = os.path.abspath(working_directory)
+    abs_file_path = os.path.abspath(os.path.join(abs_root, file_path.lstrip("/")))
+    try:
+        tree = ast.parse(content, filename=file_path)
+        compile(tree, file_path, "exec")
+    except SyntaxError as e:
+        # e.text may come from a same-named file on disk, so quote the new content
+        lines = content.splitlines()
+        text = lines[e.lineno - 1] if e.lineno and 0 < e.lineno <= len(lines) else e.text
+        line = f"\n    {text.strip()}" if text and text.strip() else ""
+        return [f"SyntaxError: {e.msg} ({file_path}, line {e.lineno}){line}"]
+    except ValueError as e:
+        return [f"ValueError: {e} ({file_path})"]
+
+    errors = []
+    search_dirs = import_search_dirs(abs_root, abs_file_path)
+    guarded = guarded_imports(tree)
+    for node in ast.walk(tree):
+        if id(node) in guarded:
+            continue
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                top_level = alias.name.split(".")[0]
+                if not _is_local(abs_root, search_dirs, top_level, staged):
+                    continue
+                if not any(_find_module(abs_root, d, alias.name, staged) for d in search_dirs):
+                    errors.append(f"ImportError: local module '{alias.name}' not found (line {node.lineno})")
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base_dir = os.path.dirname(abs_file_path)
+                for _ in range(node.level - 1):
+                    base_dir = os.path.dirname(base_dir)
+                dirs = [base_dir]
+            else:
+                if not node.module or not _is_local(abs_root, search_dirs, node.module.split(".")[0], staged):
+                    continue
+                dirs = search_dirs
+            module = node.module or ""
+            display = "." * node.level + module
+
+            module_path = next((p for d in dirs if (p := _find_module(abs_root, d, module, staged))), None)
+            is_namespace = module_path is None and any(_is_dir(os.path.join(d, *module.split(".")), staged) for d in dirs)
+            if module and module_path is None and not is_namespace:
+                errors.append(f"ImportError: local module '{display}' not found (line {node.lineno})")
+                continue
+            if module_path == abs_file_path:
+                continue
+            names = _module_names(module_path, staged) if module_path else None
+            for alias in node.names:
+                if alias.name == "*":
+                    continue
+                submodule = f"{module}.{alias.name}" if module else alias.name
+                if any(_find_module(abs_root, d, submodule, staged) for d in dirs):
+                    continue
+                if names is not None and alias.name not in names:
+                    errors.append(f"ImportError: cannot import name '{alias.name}' from '{display}' (line {node.lineno})")
+    return errors
@@ -0,0 +1,81 @@
+import os
+import threading
+from workspace_watcher import subscribe
+
+
+class ReadCache:
+    """
+    Decoded file prefixes keyed by absolute path.
+    Entries are validated against the file's mtime and size on every read, and
+    dropped on watcher change events, so a hit never returns stale content.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        subscribe(self._on_changes)
+
+    def _on_changes(self, events):
+        with self._lock:
+            for event in events:
+                if event.kind == "rescan" or event.is_dir:
+                    prefix = event.path + os.sep
+                    for path in [p for p in self._entries if p.startswith(prefix)]:
+                        del self._entries[path]
+                else:
+                    self._entries.pop(event.path, None)
+
+    @staticmethod
+    def _signature(abs_file_path):
+        stat = os.stat(abs_file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _lookup(self, abs_file_path, limit, signature):
+        with self._lock:
+            entry = self._entries.get(abs_file_path)
+        if entry is None or entry[0] != signature:
+            return None
+        _, text, complete = entry
+        if complete or len(text) >= limit:
+            return text[:limit]
+        return None
+
+    def read(self, abs_file_path, limit):
+        """Return up to `limit` characters of a file, from cache when still valid"""
+        signature = self._signature(abs_file_path)
+        text = self._lookup(abs_file_path, limit, signature)
+        if text is not None:
+            self.hits += 1
+            return text
+        self.misses += 1
+        return self.load(abs_file_path, limit, signature)
+
+    def load(self, abs_file_path, limit, signature=None):
+        """Read a file into the cache (used directly by the prefetcher)"""
+        if signature is None:
+            signature = self._signature(abs_file_path)
+        with open(abs_file_path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read(limit + 1)
+        complete = len(text) <= limit
+        text = text[:limit]
+        with self._lock:
+            existing = self._entries.get(abs_file_path)
+            # A short read racing a prefetch must not replace the longer prefix of the same version
+            if existing and existing[0] == signature and (existing[2] or len(existing[1]) >= len(text)):
+                return text
+            if len(self._entries) >= self.max_entries and abs_file_path not in self._entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[abs_file_path] = (signature, text, complete)
+        return text
+
+    def contains(self, abs_file_path, limit):
+        try:
+            return self._lookup(abs_file_path, limit, self._signature(abs_file_path)) is not None
+        except OSError:
+            return False
+
+
+read_cache = ReadCache()
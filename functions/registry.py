@@ -0,0 +1,32 @@
+"""
+Lightweight registry of tool schemas.
+
+Tool modules describe their parameters as plain dicts so importing them (and
+calling the tool functions directly) never loads the google.genai SDK; the
+SDK types are only built when the agent first needs them for a model call.
+"""
+
+TOOL_SCHEMAS = {}
+_declarations = {}
+
+
+def register_schema(schema):
+    """Register a tool schema dict (FunctionDeclaration fields) and return it unchanged"""
+    TOOL_SCHEMAS[schema["name"]] = schema
+    return schema
+
+
+def get_function_declaration(name):
+    """Build (once) the types.FunctionDeclaration for a registered tool"""
+    declaration = _declarations.get(name)
+    if declaration is None:
+        from google.genai import types
+        declaration = _declarations[name] = types.FunctionDeclaration.model_validate(TOOL_SCHEMAS[name])
+    return declaration
+
+
+def build_tool(names=None):
+    """types.Tool holding the declarations of the given (default: all registered) tools"""
+    from google.genai import types
+    names = list(TOOL_SCHEMAS) if names is None else names
+    return types.Tool(function_declarations=[get_function_declaration(name) for name in names])
@@ -0,0 +1,46 @@
+import os
+from .registry import register_schema
+from .dependency_tracker import get_tracker
+from .run_python_file import run_python_file
+
+
+def run_affected_tests(working_directory, run_all=False):
+    """
+    Run only the test files whose imports reach a file written since the last run.
+    Falls back to every test file when run_all is set.
+    """
+    tracker = get_tracker(working_directory)
+    if run_all:
+        test_files = sorted(tracker.test_dependencies())
+    else:
+        if not tracker.changed_files:
+            return "No files written since the last test run; nothing to re-run."
+        test_files = tracker.affected_tests()
+        if not test_files:
+            changed = ", ".join(sorted(os.path.relpath(f, tracker.abs_root) for f in tracker.changed_files))
+            tracker.clear_changes()
+            return f"No test files depend on the changed files ({changed})."
+
+    if not test_files:
+        return "No test files found in the working directory."
+
+    results = []
+    for test_file in test_files:
+        results.append(f"=== {test_file} ===\n{run_python_file(working_directory, test_file)}")
+    tracker.clear_changes()
+    return f"Ran {len(test_files)} affected test file(s): {', '.join(test_files)}\n\n" + "\n\n".join(results)
+
+
+schema_run_affected_tests = register_schema({
+    "name": "run_affected_tests",
+    "description": "Run only the test files affected by files written since the last test run, based on the import graph of the working directory.",
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "run_all": {
+                "type": "BOOLEAN",
+                "description": "Run every test file instead of only the affected ones.",
+            },
+        },
+    },
+})
@@ -1,12 +1,175 @@
 import os
+import re
+import signal
 import subprocess
 import sys
+import threading
+import time
 from typing import List
-from google.genai import types
+from .config import RUN_CPU_LIMIT_SECONDS, RUN_MEMORY_LIMIT_BYTES, RUN_TIMEOUT_SECONDS
+from .registry import register_schema
+from .read_cache import read_cache
+from agent_utils import AgentUtils
+from run_analytics import recorder
+from workspace_watcher import sync_watchers
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+_agent_utils = AgentUtils()
+
+# Source lines shown around each failing frame, and how many frames get context
+CONTEXT_LINES = 2
+MAX_CONTEXT_FRAMES = 4
+
+
+# Applies RLIMIT_AS/RLIMIT_CPU and execs the real command in the same process.
+# Used instead of preexec_fn, which is unsafe once the agent runs other threads
+# (prefetch, hedged requests, the workspace watcher).
+_RLIMIT_WRAPPER = """
+import os, resource, sys
+memory_limit, cpu_limit = int(sys.argv[1]), int(sys.argv[2])
+if memory_limit:
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+if cpu_limit:
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 1))
+os.execvp(sys.argv[3], sys.argv[3:])
+"""
+
+
+def _with_limits(command, memory_limit, cpu_limit):
+    if not memory_limit and not cpu_limit:
+        return command
+    return [sys.executable, "-S", "-c", _RLIMIT_WRAPPER, str(memory_limit or 0), str(int(cpu_limit or 0))] + command
+
+
+def _drain(stream, chunks):
+    chunks.append(stream.read())
+    stream.close()
+
+
+def run_with_usage(command, cwd, timeout=RUN_TIMEOUT_SECONDS, memory_limit=RUN_MEMORY_LIMIT_BYTES, cpu_limit=RUN_CPU_LIMIT_SECONDS):
+    """
+    Run a command with optional resource caps and collect what it cost.
+    Returns (returncode, stdout, stderr, usage, timed_out); usage holds CPU time,
+    peak RSS, wall time and output byte counts (CPU/RSS only where wait4 exists).
+    """
+    started = time.monotonic()
+    if resource is None or not hasattr(os, "wait4"):
+        try:
+            output = subprocess.run(command, capture_output=True, cwd=cwd, timeout=timeout)
+            returncode, stdout, stderr, timed_out = output.returncode, output.stdout, output.stderr, False
+        except subprocess.TimeoutExpired as e:
+            returncode, stdout, stderr, timed_out = None, e.stdout or b"", e.stderr or b"", True
+        usage = {"wall_seconds": round(time.monotonic() - started, 3)}
+    else:
+        process = subprocess.Popen(
+            _with_limits(command, memory_limit, cpu_limit),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+        )
+        stdout_chunks, stderr_chunks = [], []
+        readers = [
+            threading.Thread(target=_drain, args=(process.stdout, stdout_chunks), daemon=True),
+            threading.Thread(target=_drain, args=(process.stderr, stderr_chunks), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        killer = threading.Timer(timeout, process.kill) if timeout else None
+        if killer:
+            killer.start()
+        try:
+            # wait4 reaps the child ourselves so its rusage is not lost to Popen.wait
+            _, status, rusage = os.wait4(process.pid, 0)
+        finally:
+            if killer:
+                killer.cancel()
+        process.returncode = os.waitstatus_to_exitcode(status)
+        for reader in readers:
+            reader.join()
+        returncode = process.returncode
+        stdout, stderr = b"".join(stdout_chunks), b"".join(stderr_chunks)
+        timed_out = bool(timeout) and returncode == -signal.SIGKILL and time.monotonic() - started >= timeout
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak_rss = rusage.ru_maxrss if sys.platform == "darwin" else rusage.ru_maxrss * 1024
+        usage = {
+            "wall_seconds": round(time.monotonic() - started, 3),
+            "cpu_user_seconds": round(rusage.ru_utime, 3),
+            "cpu_system_seconds": round(rusage.ru_stime, 3),
+            "peak_rss_bytes": peak_rss,
+        }
+    usage["stdout_bytes"] = len(stdout)
+    usage["stderr_bytes"] = len(stderr)
+    return (
+        returncode,
+        stdout.decode("utf-8", errors="replace"),
+        stderr.decode("utf-8", errors="replace"),
+        usage,
+        timed_out,
+    )
+
+
+def format_usage(usage):
+    parts = []
+    if "cpu_user_seconds" in usage:
+        parts.append(f"cpu {usage['cpu_user_seconds']:.2f}s user + {usage['cpu_system_seconds']:.2f}s sys")
+        parts.append(f"peak RSS {usage['peak_rss_bytes'] / (1024 * 1024):.1f} MB")
+    parts.append(f"wall {usage['wall_seconds']:.2f}s")
+    parts.append(f"stdout {usage['stdout_bytes']} B, stderr {usage['stderr_bytes']} B")
+    return "Resources: " + ", ".join(parts)
+
+
+def traceback_context(working_directory, output):
+    """
+    Source excerpts around the in-workspace frames of a traceback, innermost
+    frames last, so the model does not need another read to see the failing code.
+    """
+    abs_working_directory = os.path.abspath(working_directory)
+    frames = []
+    for reference in _agent_utils.extract_file_references(output):
+        abs_path = os.path.abspath(os.path.join(abs_working_directory, reference))
+        if not abs_path.startswith(abs_working_directory + os.sep) or not os.path.isfile(abs_path):
+            continue
+        escaped = re.escape(reference)
+        for pattern in (rf'File "{escaped}", line (\d+)', rf"File '{escaped}', line (\d+)", rf'{escaped}:(\d+)'):
+            for match in re.finditer(pattern, output):
+                frames.append((match.start(), abs_path, int(match.group(1))))
+    if not frames:
+        return ""
+
+    seen = set()
+    unique_frames = []
+    for _, abs_path, line_number in sorted(frames):
+        if (abs_path, line_number) not in seen:
+            seen.add((abs_path, line_number))
+            unique_frames.append((abs_path, line_number))
+
+    sections = []
+    for abs_path, line_number in unique_frames[-MAX_CONTEXT_FRAMES:]:
+        try:
+            lines = read_cache.read(abs_path, 10 ** 6).splitlines()
+        except OSError:
+            continue
+        start = max(1, line_number - CONTEXT_LINES)
+        end = min(len(lines), line_number + CONTEXT_LINES)
+        excerpt = [
+            f"{'>' if n == line_number else ' '} {n:4d} | {lines[n - 1]}"
+            for n in range(start, end + 1)
+        ]
+        rel_path = os.path.relpath(abs_path, abs_working_directory)
+        sections.append(f"{rel_path}, line {line_number}:\n" + "\n".join(excerpt))
+    if not sections:
+        return ""
+    return "\nSource context:\n" + "\n\n".join(sections)
+
 
 def run_python_file(working_directory, file_path, args: List[str] = []):
     """
     Executes a Python file within the specified working_directory, with argument support and safety checks.
+    Runs under the configured CPU/memory caps and reports the resources the run used.
     Returns formatted stdout/stderr or error messages.
     """
     abs_working_directory = os.path.abspath(working_directory)
@@ -18,44 +181,49 @@ def run_python_file(working_directory, file_path, args: List[str] = []):
     if not abs_file_path.endswith(".py"):
         return f'Error: "{file_path}" is not a Python file.'
     try:
-        output = subprocess.run(
+        returncode, stdout, stderr, usage, timed_out = run_with_usage(
             [sys.executable, abs_file_path] + args,
-            capture_output=True,
-            text=True,
             cwd=abs_working_directory,
-            timeout=30
         )
+        # Publish files the script created or changed before anyone reads the caches
+        sync_watchers(abs_working_directory)
+        recorder.record_process(file_path, returncode, timed_out, usage)
+        resources = format_usage(usage)
+        if timed_out:
+            return f'Error: Failed to execute file "{file_path}": timed out after {RUN_TIMEOUT_SECONDS} seconds\n{resources}'
         result = (
-            f"STDOUT:\n{output.stdout}"
-            f"\nSTDERR:\n{output.stderr}"
-            f"\nReturn Code: {output.returncode}"
+            f"STDOUT:\n{stdout}"
+            f"\nSTDERR:\n{stderr}"
+            f"\nReturn Code: {returncode}"
+            f"\n{resources}"
         )
-        if output.stdout == "" and output.stderr == "":
-            return f'File "{file_path}" executed with no output.\nReturn Code: {output.returncode}'
-        if output.returncode != 0:
-            return f'Error executing file (code {output.returncode}):\n{result}'
+        if stdout == "" and stderr == "":
+            return f'File "{file_path}" executed with no output.\nReturn Code: {returncode}\n{resources}'
+        if returncode != 0:
+            if returncode < 0:
+                result += f"\nKilled by signal {signal.Signals(-returncode).name}"
+            result += traceback_context(abs_working_directory, stderr)
+            return f'Error executing file (code {returncode}):\n{result}'
         return result
     except Exception as e:
-
-
         return f'Error: Failed to execute file "{file_path}": {type(e).__name__}: {e}'
     
 
-schema_run_python_file = types.FunctionDeclaration(
-    name="run_python_file",
-    description="Execute a Python file within the working directory, with optional arguments.",
-    parameters=types.Schema(
-        type="object",
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The path to the Python file to execute, relative to the working directory.",
-            ),
-            "args": types.Schema(
-                type=types.Type.ARRAY,
-                items=types.Schema(type=types.Type.STRING),
-                description="A list of string arguments to pass to the Python file.",
-            ),
+schema_run_python_file = register_schema({
+    "name": "run_python_file",
+    "description": "Execute a Python file within the working directory, with optional arguments.",
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "file_path": {
+                "type": "STRING",
+                "description": "The path to the Python file to execute, relative to the working directory.",
+            },
+            "args": {
+                "type": "ARRAY",
+                "items": {"type": "STRING"},
+                "description": "A list of string arguments to pass to the Python file.",
+            },
         },
-    ),
-)
\ No newline at end of file
+    },
+})
\ No newline at end of file
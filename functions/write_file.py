@@ -1,47 +1,68 @@
 import os
-from google.genai import types
+from .registry import register_schema
+from .dependency_tracker import get_tracker
+from .preflight import check_python_source
+from workspace_watcher import notify_changed
 
 
 
-def write_file(working_directory, file_path, content):
+def write_file(working_directory, file_path, content, validate=True):
     """
     Write or overwrite a file within the working_directory.
     Ensures file_path is scoped to working_directory, creates parent directories if needed.
+    When validate is set, Python files are compiled and their local imports checked first,
+    and nothing is written if that fails.
     Returns a success message or an error string.
     """
     abs_working_directory = os.path.abspath(working_directory)
     abs_file_path = os.path.abspath(os.path.join(abs_working_directory, file_path.lstrip("/")))
     if not abs_file_path.startswith(abs_working_directory):
         return f'Error: Cannot write to "{file_path}" as it is outside the permitted working directory'
+
+    if validate and abs_file_path.endswith(".py"):
+        errors = check_python_source(working_directory, file_path, content)
+        if errors:
+            return f'Error: Pre-flight check failed, "{file_path}" was not written:\n' + "\n".join(errors)
     
     parent_directory = os.path.dirname(abs_file_path)
     if parent_directory and not os.path.exists(parent_directory):
+        first_new_directory = parent_directory
+        while not os.path.exists(os.path.dirname(first_new_directory)):
+            first_new_directory = os.path.dirname(first_new_directory)
         try:
             os.makedirs(parent_directory, exist_ok=True)
+            notify_changed(first_new_directory, "created", is_dir=True)
         except Exception as e:
             return f'Error: Failed to create directory "{parent_directory}": {type(e).__name__}: {e}'
     
     try:
+        existed = os.path.exists(abs_file_path)
         with open(abs_file_path, "w", encoding="utf-8") as f:
             f.write(content)
+        get_tracker(working_directory).record_write(file_path)
+        notify_changed(abs_file_path, "modified" if existed else "created")
         return f'Successfully wrote to "{file_path}" ({len(content)} characters written)'
     except Exception as e:
         return f'Error: Failed to write file "{file_path}": {type(e).__name__}: {e}'
 
-schema_write_file = types.FunctionDeclaration(
-    name="write_file",
-    description="Write or overwrite a file within the working directory. Creates the file if it does not exist.",
-    parameters=types.Schema(
-        type="object",
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The path to the file to write, relative to the working directory."
-            ),
-            "content": types.Schema(
-                type=types.Type.STRING,
-                description="The content to write to the file."
-            ),
+schema_write_file = register_schema({
+    "name": "write_file",
+    "description": "Write or overwrite a file within the working directory. Creates the file if it does not exist.",
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "file_path": {
+                "type": "STRING",
+                "description": "The path to the file to write, relative to the working directory."
+            },
+            "content": {
+                "type": "STRING",
+                "description": "The content to write to the file."
+            },
+            "validate": {
+                "type": "BOOLEAN",
+                "description": "Compile Python files and check their local imports before writing. Defaults to true."
+            },
         },
-    ),
-)
\ No newline at end of file
+    },
+})
\ No newline at end of file
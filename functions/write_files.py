@@ -0,0 +1,241 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from .config import MAX_FILES_PER_WRITE
+from .registry import register_schema
+from .dependency_tracker import get_tracker
+from .preflight import check_python_source
+from workspace_watcher import notify_changed
+
+
+def _current_umask():
+    # /proc avoids os.umask's set-and-restore, which races with other threads creating files
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def _stage(abs_file_path, content, new_file_mode):
+    """Write content to a temp file next to its target and fsync it; returns the temp path"""
+    directory, name = os.path.split(abs_file_path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(abs_file_path):
+            shutil.copymode(abs_file_path, tmp_path)
+        else:
+            # mkstemp creates 0600; give new files the mode open() (and write_file) would
+            os.chmod(tmp_path, new_file_mode)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path
+
+
+def _backup(abs_file_path):
+    """Keep the original of a file about to be replaced, as a hard link when possible"""
+    # Hidden like the temp files, so a crash mid-batch leaves nothing in listings or the file index
+    directory, name = os.path.split(abs_file_path)
+    backup_path = os.path.join(directory, f".{name}.{os.urandom(4).hex()}.bak")
+    try:
+        os.link(abs_file_path, backup_path)
+    except OSError:
+        shutil.copy2(abs_file_path, backup_path)
+    return backup_path
+
+
+def _fsync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on this platform
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def write_files(working_directory, files, validate=True):
+    """
+    Write several files within the working_directory as one transaction.
+    Every path (and, when validate is set, every Python file) is checked before
+    anything is written. Contents are written and fsynced to temp files in
+    parallel, then renamed into place; if any rename fails, replaced files are
+    restored from backups and newly created files and directories are removed.
+    Returns a one-line summary or an error string.
+    """
+    abs_working_directory = os.path.abspath(working_directory)
+    if not files:
+        return "Error: No files to write"
+    if len(files) > MAX_FILES_PER_WRITE:
+        return f"Error: At most {MAX_FILES_PER_WRITE} files can be written in one call, got {len(files)}"
+
+    errors = []
+    staged = {}
+    targets = []
+    for entry in files:
+        file_path = entry.get("file_path") if isinstance(entry, dict) else None
+        content = entry.get("content") if isinstance(entry, dict) else None
+        if not isinstance(file_path, str) or not isinstance(content, str):
+            errors.append(f"Each file needs a file_path and a content string, got {entry!r:.80}")
+            continue
+        abs_file_path = os.path.abspath(os.path.join(abs_working_directory, file_path.lstrip("/")))
+        if not abs_file_path.startswith(abs_working_directory + os.sep):
+            errors.append(f'Cannot write to "{file_path}" as it is outside the permitted working directory')
+        elif abs_file_path in staged:
+            errors.append(f'"{file_path}" is listed more than once')
+        elif os.path.isdir(abs_file_path):
+            errors.append(f'"{file_path}" is a directory')
+        else:
+            staged[abs_file_path] = content
+            targets.append((file_path, abs_file_path, content))
+
+    if validate and not errors:
+        for file_path, abs_file_path, content in targets:
+            if abs_file_path.endswith(".py"):
+                errors.extend(check_python_source(working_directory, file_path, content, staged=staged))
+    if errors:
+        return "Error: Nothing was written:\n" + "\n".join(errors)
+
+    created_directories = []
+    for directory in sorted({os.path.dirname(abs_file_path) for _, abs_file_path, _ in targets}):
+        missing = []
+        while not os.path.exists(directory):
+            missing.append(directory)
+            directory = os.path.dirname(directory)
+        for new_directory in reversed(missing):
+            try:
+                os.mkdir(new_directory)
+            except FileExistsError:
+                continue
+            except OSError as e:
+                for created in reversed(created_directories):
+                    os.rmdir(created)
+                return f'Error: Failed to create directory "{new_directory}": {type(e).__name__}: {e}'
+            created_directories.append(new_directory)
+
+    existed = {abs_file_path: os.path.exists(abs_file_path) for _, abs_file_path, _ in targets}
+    new_file_mode = 0o666 & ~_current_umask()
+    with ThreadPoolExecutor(max_workers=min(8, len(targets))) as executor:
+        futures = [
+            executor.submit(_stage, abs_file_path, content, new_file_mode)
+            for _, abs_file_path, content in targets
+        ]
+    temp_paths = []
+    failure = None
+    for (file_path, _, _), future in zip(targets, futures):
+        try:
+            temp_paths.append(future.result())
+        except Exception as e:
+            failure = failure or f'Failed to write "{file_path}": {type(e).__name__}: {e}'
+
+    replaced = []
+    if failure is None:
+        for (file_path, abs_file_path, _), tmp_path in zip(targets, temp_paths):
+            backup_path = None
+            try:
+                backup_path = _backup(abs_file_path) if existed[abs_file_path] else None
+                os.replace(tmp_path, abs_file_path)
+            except Exception as e:
+                # The target is untouched, but its backup was already taken
+                if backup_path:
+                    _remove(backup_path)
+                failure = f'Failed to replace "{file_path}": {type(e).__name__}: {e}'
+                break
+            replaced.append((abs_file_path, backup_path))
+
+    if failure is not None:
+        for abs_file_path, backup_path in reversed(replaced):
+            if backup_path:
+                os.replace(backup_path, abs_file_path)
+            else:
+                _remove(abs_file_path)
+        for tmp_path in temp_paths:
+            _remove(tmp_path)
+        for abs_file_path, backup_path in replaced:
+            if backup_path:
+                _remove(backup_path)
+        for directory in reversed(created_directories):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+        return f"Error: {failure}; all changes were rolled back"
+
+    for _, backup_path in replaced:
+        if backup_path:
+            _remove(backup_path)
+    # One fsync per directory makes the renames themselves durable
+    directories = {os.path.dirname(abs_file_path) for _, abs_file_path, _ in targets}
+    directories.update(os.path.dirname(directory) for directory in created_directories)
+    for directory in directories:
+        _fsync_directory(directory)
+
+    tracker = get_tracker(working_directory)
+    for directory in created_directories:
+        if os.path.dirname(directory) not in created_directories:
+            notify_changed(directory, "created", is_dir=True)
+    for file_path, abs_file_path, _ in targets:
+        tracker.record_write(file_path)
+        notify_changed(abs_file_path, "modified" if existed[abs_file_path] else "created")
+
+    created = sum(1 for exists in existed.values() if not exists)
+    total_chars = sum(len(content) for _, _, content in targets)
+    return (
+        f"Successfully wrote {len(targets)} files ({created} created, {len(targets) - created} modified, "
+        f"{total_chars} characters written): " + ", ".join(file_path for file_path, _, _ in targets)
+    )
+
+
+schema_write_files = register_schema({
+    "name": "write_files",
+    "description": "Write or overwrite several files within the working directory in one all-or-nothing step. Prefer this over repeated write_file calls for changes that span files.",
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "files": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "file_path": {
+                            "type": "STRING",
+                            "description": "The path to the file to write, relative to the working directory.",
+                        },
+                        "content": {
+                            "type": "STRING",
+                            "description": "The full content to write to the file.",
+                        },
+                    },
+                    "required": ["file_path", "content"],
+                },
+                "description": "The files to write.",
+            },
+            "validate": {
+                "type": "BOOLEAN",
+                "description": "Compile Python files and check their local imports before writing anything. Defaults to true.",
+            },
+        },
+        "required": ["files"],
+    },
+})
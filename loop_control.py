@@ -0,0 +1,93 @@
+import hashlib
+import json
+import time
+
+# Tools without side effects: identical calls can be answered from the previous result
+READ_ONLY_TOOLS = {"get_files_info", "get_file_content", "get_files_content"}
+
+
+def call_key(function_call_part):
+    """Stable key for a function call: its name plus canonically ordered arguments"""
+    args = dict(function_call_part.args) if function_call_part.args else {}
+    return function_call_part.name, json.dumps(args, sort_keys=True, default=str)
+
+
+def result_digest(function_call_result):
+    """Hash of the responses carried by a function result Content"""
+    responses = []
+    for part in function_call_result.parts or []:
+        function_response = getattr(part, "function_response", None)
+        responses.append(function_response.response if function_response else None)
+    payload = json.dumps(responses, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LoopGuard:
+    """
+    Budget and progress tracking for the agent loop.
+    Stops the session when it runs out of iterations, wall-clock time or tokens,
+    or when it keeps repeating identical calls that return identical results.
+    Read-only calls repeated with no write in between are answered from cache.
+    """
+
+    def __init__(self, max_iterations=10, max_seconds=None, max_tokens=None, max_stalled_iterations=2):
+        self.max_iterations = max_iterations
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.max_stalled_iterations = max_stalled_iterations
+        self.started_at = time.monotonic()
+        self.tokens_used = 0
+        self.short_circuited = 0
+        self.stalled_iterations = 0
+        self._result_cache = {}
+        self._seen_results = set()
+        self._iteration_progress = False
+
+    def cached_result(self, function_call_part):
+        """Previous result for an identical read-only call, or None"""
+        key = call_key(function_call_part)
+        if key[0] not in READ_ONLY_TOOLS:
+            return None
+        cached = self._result_cache.get(key)
+        if cached is not None:
+            self.short_circuited += 1
+        return cached
+
+    def record_call(self, function_call_part, function_call_result):
+        key = call_key(function_call_part)
+        if key[0] in READ_ONLY_TOOLS:
+            self._result_cache[key] = function_call_result
+        else:
+            # Writes and script runs can change anything a read would return
+            self._result_cache.clear()
+
+        seen = (key, result_digest(function_call_result))
+        if seen not in self._seen_results:
+            self._seen_results.add(seen)
+            self._iteration_progress = True
+
+    def record_response(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        total = getattr(usage, "total_token_count", None) if usage else None
+        if total:
+            self.tokens_used += total
+
+    def end_iteration(self):
+        """Close an iteration of tool calls; returns a stop reason when the loop is stuck"""
+        if self._iteration_progress:
+            self.stalled_iterations = 0
+        else:
+            self.stalled_iterations += 1
+        self._iteration_progress = False
+        if self.stalled_iterations >= self.max_stalled_iterations:
+            return f"no progress in {self.stalled_iterations} iterations (repeated identical tool calls and results)"
+        return None
+
+    def budget_exhausted(self):
+        """Stop reason when the wall-clock or token budget is spent, else None"""
+        elapsed = time.monotonic() - self.started_at
+        if self.max_seconds is not None and elapsed >= self.max_seconds:
+            return f"time budget of {self.max_seconds}s exhausted ({elapsed:.1f}s elapsed)"
+        if self.max_tokens is not None and self.tokens_used >= self.max_tokens:
+            return f"token budget of {self.max_tokens} exhausted ({self.tokens_used} tokens used)"
+        return None
@@ -1,57 +1,174 @@
 import os
 import sys
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-from functions.get_files_info import schema_get_files_info
-from functions.get_file_contents import schema_get_file_content
-from functions.write_file import schema_write_file
-from functions.run_python_file import schema_run_python_file
-from call_function import call_function
+from agent_utils import AgentUtils
+from functions.registry import build_tool
+from call_function import WORKING_DIRECTORY, call_function
+from loop_control import LoopGuard
+from model_client import DEFAULT_REQUESTS_PER_MINUTE, ResilientModelClient, get_shared_limiter
+from prompt_cache import DEFAULT_CACHE_TTL_SECONDS, MIN_CACHE_TOKENS, PromptCache, repo_summary
+from run_analytics import append_record, main as report_main, recorder
+from session_store import SessionStore
+from workspace_watcher import start_watcher
+
+MODEL = "gemini-2.0-flash-001"
+
+def get_option(name, default=None, cast=str):
+    """Read a `--name value` or `--name=value` command line option"""
+    for i, arg in enumerate(sys.argv):
+        if arg == name and i + 1 < len(sys.argv):
+            return cast(sys.argv[i + 1])
+        if arg.startswith(name + "="):
+            return cast(arg[len(name) + 1:])
+    return default
 
 def main():
     if len(sys.argv) < 2:
         print("Usage: python main.py 'your request'")
+        print("       python main.py --resume <session|latest>")
+        print("       python main.py --report")
         sys.exit(1)
 
+    if sys.argv[1] == "--report":
+        report_main(sys.argv[2:])
+        return
+
+    # The SDK is imported only once a model call is actually needed
+    from google import genai
+    from google.genai import types
+
     load_dotenv()
     api_key = os.getenv("GEMINI_API_KEY")
-    prompt = sys.argv[1]
     verbose = '--verbose' in sys.argv
+    store = SessionStore()
+    resume_id = get_option("--resume")
+    if not resume_id and any(arg == "--resume" or arg.startswith("--resume=") for arg in sys.argv):
+        print("Error: --resume needs a session id or 'latest'")
+        sys.exit(1)
+    if resume_id:
+        try:
+            state = store.load(resume_id)
+        except FileNotFoundError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        session_id = state["session_id"]
+        prompt = state["prompt"]
+        if state.get("final_response"):
+            print(f"Session {session_id} already finished.")
+            print("\nResponse:")
+            print(state["final_response"])
+            return
+        print(f"Resuming session {session_id} at iteration {state['iteration']}")
+    else:
+        state = None
+        session_id = store.new_session_id()
+        prompt = sys.argv[1]
+        print(f"Session {session_id} (resume with --resume {session_id})")
+    recorder.reset(session_id, resumed=bool(resume_id))
+    guard = LoopGuard(
+        max_iterations=get_option("--max-iterations", 10, int),
+        max_seconds=get_option("--max-seconds", None, float),
+        max_tokens=get_option("--max-tokens", None, int),
+    )
+    
+    if '--watch' in sys.argv:
+        watcher = start_watcher(WORKING_DIRECTORY)
+        if verbose:
+            print(f"Watching {WORKING_DIRECTORY} for changes ({watcher.backend_name})")
     
     client = genai.Client(api_key=api_key)
+    model = ResilientModelClient(
+        client.models.generate_content,
+        limiter=get_shared_limiter("gemini", get_option("--rpm", DEFAULT_REQUESTS_PER_MINUTE, int)),
+        max_retries=get_option("--max-retries", 4, int),
+        hedge_percentile=get_option("--hedge-percentile", None, float),
+    )
     
-    tools = types.Tool(function_declarations=[
-        schema_get_files_info,
-        schema_get_file_content,
-        schema_write_file,
-        schema_run_python_file
+    tools = build_tool([
+        "get_files_info",
+        "get_file_content",
+        "get_files_content",
+        "write_file",
+        "write_files",
+        "run_python_file",
+        "run_affected_tests",
     ])
     
     system_prompt = """You are a coding agent. The calculator project is in the calculator/ directory.
 
 Always start by calling get_files_info to see files in calculator directory.
-Read files before making changes. Make actual code fixes."""
+Read files before making changes; use get_files_content to read several files in one call. Make actual code fixes.
+When a change spans several files, write them together with write_files.
+After writing files, call run_affected_tests to re-run only the tests affected by your changes."""
+
+    if state:
+        messages = [types.Content.model_validate(message) for message in state["messages"]]
+        # Checkpoints from before the initial context moved into the cached prefix keep it in messages
+        initial_context = state.get("initial_context", "")
+        start_iteration = state["iteration"]
+        guard.tokens_used = state.get("tokens_used", 0)
+    else:
+        # Excerpts of the files the prompt points at, so the first reads can be skipped
+        agent_utils = AgentUtils()
+        context_tokens = get_option("--context-tokens", agent_utils.token_budget, int)
+        initial_context = agent_utils.initial_context(prompt, WORKING_DIRECTORY, context_tokens) if context_tokens else ""
+        if initial_context and verbose:
+            print(f"Initial context: {len(initial_context)} characters")
+        messages = [types.Content(role="user", parts=[types.Part(text=prompt)])]
+        start_iteration = 0
 
-    messages = [types.Content(role="user", parts=[types.Part(text=prompt)])]
+    def checkpoint(iteration, final_response=None):
+        store.save(session_id, {
+            "prompt": prompt,
+            "initial_context": initial_context,
+            "iteration": iteration,
+            "tokens_used": guard.tokens_used,
+            "final_response": final_response,
+            "messages": [message.model_dump(mode="json", exclude_none=True) for message in messages],
+        })
     
-    config = types.GenerateContentConfig(
+    # System prompt, tool schemas and initial context are identical on every request;
+    # the repository summary is only worth adding once they are cached
+    prompt_cache = PromptCache(
+        None if '--no-prompt-cache' in sys.argv else client.caches,
+        model=MODEL,
+        system_instruction=system_prompt,
         tools=[tools],
-        system_instruction=system_prompt
+        contents=[types.Content(role="user", parts=[types.Part(text=initial_context)])] if initial_context else [],
+        cache_only_contents=[types.Content(role="user", parts=[types.Part(text=repo_summary(WORKING_DIRECTORY))])],
+        ttl_seconds=get_option("--cache-ttl", DEFAULT_CACHE_TTL_SECONDS, int),
+        min_tokens=get_option("--cache-min-tokens", MIN_CACHE_TOKENS, int),
     )
 
     # Simple agent loop - exactly like your original approach
-    for iteration in range(10):
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-001",
-            contents=messages,
-            config=config,
-        )
+    stop_reason = None
+    final_response = None
+    for iteration in range(start_iteration, guard.max_iterations):
+        stop_reason = guard.budget_exhausted()
+        if stop_reason:
+            break
+
+        try:
+            response = model.generate_content(model=MODEL, **prompt_cache.request(messages))
+        except Exception as e:
+            if not prompt_cache.active:
+                raise
+            # The cached prefix may have expired or been deleted; resend it inline
+            prompt_cache.invalidate(e)
+            response = model.generate_content(model=MODEL, **prompt_cache.request(messages))
+        guard.record_response(response)
+        recorder.record_response(response)
         
         # Handle function calls - using your exact pattern
         if hasattr(response, 'function_calls') and response.function_calls:
             for function_call_part in response.function_calls:
-                function_call_result = call_function(function_call_part, verbose=verbose)
+                function_call_result = guard.cached_result(function_call_part)
+                if function_call_result is not None:
+                    print(f" - Reusing previous result for: {function_call_part.name}")
+                    recorder.record_tool_call(function_call_part.name, 0.0, cached=True)
+                else:
+                    function_call_result = call_function(function_call_part, verbose=verbose)
+                guard.record_call(function_call_part, function_call_result)
                 messages.append(types.Content(role="user", parts=function_call_result.parts))
         
         # Add model responses
@@ -62,11 +179,34 @@ Read files before making changes. Make actual code fixes."""
         
         # Final response
         if hasattr(response, 'text') and response.text:
-            print("\nResponse:")
-            print(response.text)
-            return
+            final_response = response.text
+            checkpoint(iteration + 1, final_response)
+            break
+
+        checkpoint(iteration + 1)
+
+        stop_reason = guard.end_iteration()
+        if stop_reason:
+            break
+
+    append_record(recorder.to_record(
+        start_iteration=start_iteration,
+        completed=bool(final_response),
+        stop_reason=stop_reason,
+        short_circuited=guard.short_circuited,
+        prompt_cache=prompt_cache.snapshot(),
+    ))
 
-    print("Agent completed")
+    if final_response:
+        print("\nResponse:")
+        print(final_response)
+    elif stop_reason:
+        print(f"Agent stopped early: {stop_reason}")
+    else:
+        print("Agent completed")
+    if verbose:
+        print(f"Model client metrics: {model.metrics.snapshot()}")
+        print(f"Prompt cache: {prompt_cache.snapshot()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
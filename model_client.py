@@ -0,0 +1,207 @@
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# HTTP statuses worth retrying: throttling, timeouts and transient server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+DEFAULT_REQUESTS_PER_MINUTE = 60
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+_shared_limiters = {}
+_shared_limiters_lock = threading.Lock()
+
+
+def get_shared_limiter(name, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, burst=None):
+    """Process-wide limiter for a quota, shared by every session calling the same backend"""
+    with _shared_limiters_lock:
+        limiter = _shared_limiters.get(name)
+        if limiter is None:
+            capacity = burst if burst is not None else max(1, requests_per_minute // 10)
+            limiter = _shared_limiters[name] = TokenBucket(requests_per_minute / 60.0, capacity)
+        return limiter
+
+
+def is_retryable(error):
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # The SDK's transport errors (ConnectError, ReadTimeout, RemoteProtocolError...) come
+    # from httpx; it is already loaded whenever one is raised, so never import it here
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(error, httpx.TransportError)
+
+
+class ClientMetrics:
+    """Counters and latency samples for model calls"""
+
+    def __init__(self, max_samples=500):
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.wait_seconds = 0.0
+        self.latencies = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def add(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def latency_percentile(self, percentile):
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(percentile / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self):
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "latency_p50": round(p50, 3) if p50 is not None else None,
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+        }
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="model-hedge")
+
+
+class ResilientModelClient:
+    """
+    Wraps a `generate_content(**kwargs)` callable with client-side rate limiting,
+    jittered exponential retry on 429/5xx and optional hedged requests: when a call
+    takes longer than the observed latency percentile, a second identical request
+    is started and whichever finishes first wins.
+    """
+
+    def __init__(self, generate_fn, limiter=None, metrics=None, max_retries=4, base_delay=0.5,
+                 max_delay=20.0, hedge_percentile=None, hedge_min_samples=20,
+                 sleep=time.sleep, rng=random.random):
+        self.generate_fn = generate_fn
+        self.limiter = limiter
+        self.metrics = metrics or ClientMetrics()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self._sleep = sleep
+        self._rng = rng
+
+    def generate_content(self, **kwargs):
+        self.metrics.add(requests=1)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._attempt(kwargs)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    self.metrics.add(failures=1)
+                    raise
+                # Full jitter keeps parallel sessions from retrying in lockstep
+                delay = self._rng() * min(self.max_delay, self.base_delay * 2 ** attempt)
+                self.metrics.add(retries=1, wait_seconds=delay)
+                self._sleep(delay)
+
+    def _acquire(self):
+        if self.limiter is not None:
+            self.metrics.add(wait_seconds=self.limiter.acquire())
+
+    def _timed_call(self, kwargs, limited=True):
+        if limited:
+            self._acquire()
+        self.metrics.add(attempts=1)
+        started = time.monotonic()
+        response = self.generate_fn(**kwargs)
+        self.metrics.record_latency(time.monotonic() - started)
+        return response
+
+    def _hedge_threshold(self):
+        if self.hedge_percentile is None or len(self.metrics.latencies) < self.hedge_min_samples:
+            return None
+        return self.metrics.latency_percentile(self.hedge_percentile)
+
+    def _attempt(self, kwargs):
+        threshold = self._hedge_threshold()
+        if threshold is None:
+            return self._timed_call(kwargs)
+
+        primary = _hedge_executor.submit(self._timed_call, kwargs)
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+        # Only hedge when the quota allows it right now; never queue behind the limiter
+        if self.limiter is not None and not self.limiter.try_acquire():
+            return primary.result()
+
+        self.metrics.add(hedges=1)
+        hedge = _hedge_executor.submit(self._timed_call, kwargs, False)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.metrics.add(hedge_wins=1)
+                    return future.result()
+                error = future.exception()
+        raise error
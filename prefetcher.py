@@ -0,0 +1,89 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from agent_utils import AgentUtils
+from functions.config import MAX_CHARS
+from functions.read_cache import read_cache
+
+PRIORITY_NAMES = ['main.py', 'tests.py', '__init__.py', 'app.py', 'run.py']
+PREFETCH_EXTENSIONS = ('.py', '.txt', '.md', '.json', '.toml', '.cfg')
+MAX_PREFETCH_SIZE = 50000
+
+
+class Prefetcher:
+    """
+    Speculatively reads the files the model is likely to ask for next into the
+    read cache, on a thread pool, while the model is still generating.
+    Listings from get_files_info prefetch the most likely files of that directory;
+    failed script runs prefetch the workspace files named in the traceback.
+    """
+
+    def __init__(self, max_workers=4, max_files=5):
+        self.max_files = max_files
+        self.utils = AgentUtils()
+        self.scheduled = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+
+    def after_call(self, function_name, args, result):
+        """Schedule prefetches based on a tool call and its result"""
+        if not isinstance(result, str) or result.startswith("Error: Cannot"):
+            return []
+        working_directory = args.get("working_directory")
+        if not working_directory:
+            return []
+        if function_name == "get_files_info":
+            candidates = self._listing_candidates(working_directory, args.get("directory", "."))
+        elif function_name in ("run_python_file", "run_affected_tests"):
+            candidates = self._traceback_candidates(working_directory, result)
+        else:
+            return []
+        return self.prefetch(candidates)
+
+    def prefetch(self, abs_paths):
+        scheduled = []
+        for abs_path in abs_paths[:self.max_files]:
+            if read_cache.contains(abs_path, MAX_CHARS + 1):
+                continue
+            self._executor.submit(self._load, abs_path)
+            scheduled.append(abs_path)
+        self.scheduled += len(scheduled)
+        return scheduled
+
+    @staticmethod
+    def _load(abs_path):
+        try:
+            read_cache.load(abs_path, MAX_CHARS + 1)
+        except OSError:
+            pass
+
+    def _listing_candidates(self, working_directory, directory):
+        abs_working_directory = os.path.abspath(working_directory)
+        abs_directory = os.path.abspath(os.path.join(abs_working_directory, directory.lstrip("/")))
+        if not abs_directory.startswith(abs_working_directory):
+            return []
+        try:
+            names = os.listdir(abs_directory)
+        except OSError:
+            return []
+        candidates = []
+        for name in names:
+            path = os.path.join(abs_directory, name)
+            if name.startswith('.') or not name.endswith(PREFETCH_EXTENSIONS) or not os.path.isfile(path):
+                continue
+            size = os.path.getsize(path)
+            if size <= MAX_PREFETCH_SIZE:
+                candidates.append((name not in PRIORITY_NAMES, not name.endswith('.py'), size, path))
+        # Entry points first, then Python sources, then smaller files
+        return [path for *_, path in sorted(candidates)]
+
+    def _traceback_candidates(self, working_directory, result):
+        abs_working_directory = os.path.abspath(working_directory)
+        candidates = []
+        for reference in self.utils.extract_file_references(result):
+            path = os.path.abspath(os.path.join(abs_working_directory, reference))
+            if (path.startswith(abs_working_directory + os.sep) and os.path.isfile(path)
+                    and os.path.getsize(path) <= MAX_PREFETCH_SIZE and path not in candidates):
+                candidates.append(path)
+        return candidates
+
+
+prefetcher = Prefetcher()
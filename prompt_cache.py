@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import time
+from agent_utils import estimate_tokens
+from workspace_watcher import workspace_files
+
+DEFAULT_CACHE_TTL_SECONDS = 3600
+# Extend the TTL once less than this much of it is left
+REFRESH_MARGIN_SECONDS = 300
+# Providers reject context caches below a minimum size; smaller prefixes are sent inline
+MIN_CACHE_TOKENS = 4096
+MAX_SUMMARY_FILES = 300
+
+
+def repo_summary(working_directory, max_files=MAX_SUMMARY_FILES):
+    """Compact listing of the working directory: one `path (size)` line per file"""
+    abs_working_directory = os.path.abspath(working_directory)
+    lines = []
+    for abs_file_path in sorted(workspace_files(abs_working_directory))[:max_files]:
+        try:
+            size = os.path.getsize(abs_file_path)
+        except OSError:
+            continue
+        lines.append(f"{os.path.relpath(abs_file_path, abs_working_directory)} ({size} bytes)")
+    return f"Files in the working directory '{working_directory}':\n" + "\n".join(lines)
+
+
+def _dump(value):
+    return value.model_dump(mode="json", exclude_none=True) if hasattr(value, "model_dump") else value
+
+
+def prefix_digest(model, system_instruction, tools, contents):
+    """Hash identifying a static prompt prefix; used as the cache's display name"""
+    payload = json.dumps(
+        [model, system_instruction, [_dump(t) for t in tools], [_dump(c) for c in contents]],
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return "agent-prefix-" + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class PromptCache:
+    """
+    The static start of every request (system prompt, tool declarations and the
+    initial context), uploaded once through the provider's context cache and
+    then referenced by name, so each iteration only sends the conversation.
+    cache_only_contents (e.g. a repository summary) are added to the cached
+    prefix but never sent inline, so the fallback costs no more than before.
+    Caches are found again by the prefix hash, so sessions with the same prefix
+    share one; the TTL is extended while the session runs. When caching is
+    unavailable the prefix is sent inline as before.
+    """
+
+    def __init__(self, caches, model, system_instruction, tools, contents=(), cache_only_contents=(),
+                 ttl_seconds=DEFAULT_CACHE_TTL_SECONDS, refresh_margin=REFRESH_MARGIN_SECONDS,
+                 min_tokens=MIN_CACHE_TOKENS, clock=time.time):
+        self.caches = caches
+        self.model = model
+        self.system_instruction = system_instruction
+        self.tools = list(tools)
+        self.contents = list(contents)
+        self.cached_contents = list(cache_only_contents) + self.contents
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.min_tokens = min_tokens
+        self.digest = prefix_digest(model, system_instruction, self.tools, self.cached_contents)
+        self.name = None
+        self.expires_at = None
+        self.disabled_reason = None if caches is not None else "caching disabled"
+        self.created = 0
+        self.reused = 0
+        self.refreshed = 0
+        self.failures = 0
+        self._clock = clock
+        self._inline_config = None
+
+    @property
+    def active(self):
+        return self.name is not None
+
+    def prefix_tokens(self):
+        """Estimated size of the prefix as it would be cached"""
+        text = json.dumps(
+            [self.system_instruction, [_dump(t) for t in self.tools], [_dump(c) for c in self.cached_contents]],
+            default=str,
+        )
+        return estimate_tokens(text)
+
+    def _ttl(self):
+        return f"{int(self.ttl_seconds)}s"
+
+    def _disable(self, reason):
+        self.failures += 1
+        self.disabled_reason = reason
+        self.name = None
+
+    def _find_existing(self):
+        for cached in self.caches.list():
+            if cached.display_name != self.digest or not (cached.model or "").endswith(self.model):
+                continue
+            expire_time = getattr(cached, "expire_time", None)
+            expires_at = expire_time.timestamp() if expire_time else None
+            if expires_at is None or expires_at > self._clock():
+                return cached.name, expires_at
+        return None, None
+
+    def _create(self):
+        from google.genai import types
+
+        self.name, self.expires_at = self._find_existing()
+        if self.name:
+            self.reused += 1
+            return
+        cached = self.caches.create(
+            model=self.model,
+            config=types.CreateCachedContentConfig(
+                display_name=self.digest,
+                system_instruction=self.system_instruction,
+                tools=self.tools,
+                contents=self.cached_contents or None,
+                ttl=self._ttl(),
+            ),
+        )
+        self.name = cached.name
+        self.expires_at = self._clock() + self.ttl_seconds
+        self.created += 1
+
+    def _refresh(self):
+        from google.genai import types
+
+        self.caches.update(name=self.name, config=types.UpdateCachedContentConfig(ttl=self._ttl()))
+        self.expires_at = self._clock() + self.ttl_seconds
+        self.refreshed += 1
+
+    def ensure(self):
+        """Create, find or extend the provider cache; returns its name or None when inline"""
+        if self.disabled_reason:
+            return None
+        try:
+            if self.name is None:
+                if self.prefix_tokens() < self.min_tokens:
+                    self.disabled_reason = f"prefix below {self.min_tokens} tokens"
+                    return None
+                self._create()
+            elif self.expires_at is None or self.expires_at - self._clock() < self.refresh_margin:
+                self._refresh()
+        except Exception as e:
+            self._disable(f"{type(e).__name__}: {e}")
+        return self.name
+
+    def invalidate(self, error):
+        """Stop using the cache after a request that referenced it failed"""
+        self._disable(f"{type(error).__name__}: {error}")
+
+    def request(self, messages):
+        """contents and config for generate_content, referencing the cache when possible"""
+        from google.genai import types
+
+        if self.ensure():
+            return {"contents": messages, "config": types.GenerateContentConfig(cached_content=self.name)}
+        if self._inline_config is None:
+            self._inline_config = types.GenerateContentConfig(
+                tools=self.tools,
+                system_instruction=self.system_instruction,
+            )
+        return {"contents": self.contents + list(messages), "config": self._inline_config}
+
+    def snapshot(self):
+        return {
+            "name": self.name,
+            "digest": self.digest,
+            "prefix_tokens": self.prefix_tokens(),
+            "created": self.created,
+            "reused": self.reused,
+            "refreshed": self.refreshed,
+            "failures": self.failures,
+            "inline_reason": self.disabled_reason,
+        }
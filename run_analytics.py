@@ -0,0 +1,213 @@
+"""
+Per-session run records and an aggregate report over them.
+
+The agent appends one JSON line per session to .agent_sessions/runs.jsonl with
+its iterations, tool calls and their durations, how smart_file_search resolved
+paths (direct / exact / fuzzy / unresolved), token usage and the resources each
+script run used (CPU, peak RSS, wall time).
+
+Usage: python run_analytics.py [--log .agent_sessions/runs.jsonl] [--freq D]
+       python main.py --report [...]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from session_store import SESSIONS_DIR
+
+RUNS_LOG = os.path.join(SESSIONS_DIR, "runs.jsonl")
+PATH_OUTCOMES = ("direct", "exact", "fuzzy", "unresolved")
+USAGE_FIELDS = ("prompt_token_count", "candidates_token_count", "cached_content_token_count", "total_token_count")
+PERCENTILES = [0.5, 0.9, 0.99]
+
+
+class RunRecorder:
+    """Collects the statistics of the current agent session"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, session_id=None, resumed=False):
+        with self._lock:
+            self.session_id = session_id
+            self.resumed = resumed
+            self.started_at = time.time()
+            self._started = time.monotonic()
+            self.iterations = 0
+            self.tool_calls = []
+            self.processes = []
+            self.path_resolutions = Counter()
+            self.tokens = Counter()
+
+    def record_path_resolution(self, outcome):
+        with self._lock:
+            self.path_resolutions[outcome] += 1
+
+    def record_tool_call(self, name, seconds, error=False, cached=False):
+        with self._lock:
+            self.tool_calls.append({
+                "name": name,
+                "seconds": round(seconds, 6),
+                "error": error,
+                "cached": cached,
+            })
+
+    def record_process(self, file_path, returncode, timed_out, usage):
+        """Resource usage of a script run by run_python_file"""
+        with self._lock:
+            self.processes.append(dict(usage, file_path=file_path, returncode=returncode, timed_out=timed_out))
+
+    def record_response(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        with self._lock:
+            self.iterations += 1
+            for field in USAGE_FIELDS:
+                self.tokens[field] += getattr(usage, field, None) or 0
+
+    def to_record(self, **extra):
+        with self._lock:
+            record = {
+                "session_id": self.session_id,
+                "resumed": self.resumed,
+                "started_at": self.started_at,
+                "duration_seconds": round(time.monotonic() - self._started, 3),
+                "iterations": self.iterations,
+                "tool_calls": list(self.tool_calls),
+                "processes": list(self.processes),
+                "path_resolutions": {outcome: self.path_resolutions[outcome] for outcome in PATH_OUTCOMES},
+                "tokens": {field: self.tokens[field] for field in USAGE_FIELDS},
+            }
+        record.update(extra)
+        return record
+
+
+def append_record(record, path=RUNS_LOG):
+    """Append a session record as one JSON line"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def load_runs(path=RUNS_LOG):
+    """
+    Load session records into three DataFrames: one row per session, one row
+    per tool call and one row per script run (both with their session_id).
+    """
+    # pandas is only needed for reporting, not by the agent itself
+    import pandas as pd
+
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # A session killed mid-write leaves a partial last line
+
+    sessions = pd.json_normalize(records, sep="_").drop(columns=["tool_calls", "processes"], errors="ignore")
+    if "started_at" in sessions:
+        sessions["started_at"] = pd.to_datetime(sessions["started_at"], unit="s")
+    calls = pd.DataFrame(
+        [
+            dict(call, session_id=record.get("session_id"), started_at=record.get("started_at"))
+            for record in records
+            for call in record.get("tool_calls", [])
+        ],
+        columns=["name", "seconds", "error", "cached", "session_id", "started_at"],
+    )
+    calls["started_at"] = pd.to_datetime(calls["started_at"], unit="s")
+    processes = pd.DataFrame(
+        [dict(run, session_id=record.get("session_id")) for record in records for run in record.get("processes", [])],
+        columns=["file_path", "returncode", "timed_out", "wall_seconds", "cpu_user_seconds",
+                 "cpu_system_seconds", "peak_rss_bytes", "session_id"],
+    )
+    return sessions, calls, processes
+
+
+def build_report(sessions, calls, processes=None, freq="D"):
+    """Text report: session percentiles, per-tool latency, script resources, path resolution and trends"""
+    import pandas as pd
+
+    if sessions.empty:
+        return "No sessions recorded"
+
+    lines = [f"Sessions: {len(sessions)}"]
+    summary = pd.DataFrame({
+        "iterations": sessions["iterations"],
+        "duration_s": sessions["duration_seconds"],
+        "total_tokens": sessions["tokens_total_token_count"],
+        "prompt_tokens": sessions["tokens_prompt_token_count"],
+        "cached_tokens": sessions["tokens_cached_content_token_count"],
+        "tool_calls": calls.groupby("session_id").size().reindex(sessions["session_id"], fill_value=0).values,
+    })
+    lines += ["", "Per session:", summary.describe(percentiles=PERCENTILES).T.round(2).to_string()]
+
+    if not calls.empty:
+        executed = calls[~calls["cached"]]
+        tools = executed.groupby("name")["seconds"].describe(percentiles=PERCENTILES)
+        tools["total_s"] = executed.groupby("name")["seconds"].sum()
+        tools["error_rate"] = executed.groupby("name")["error"].mean()
+        tools["cached"] = calls[calls["cached"]].groupby("name").size().reindex(tools.index, fill_value=0)
+        tools = tools.drop(columns=["std", "min"]).sort_values("total_s", ascending=False)
+        lines += ["", "Tool calls (seconds):", tools.round(4).to_string()]
+
+    if processes is not None and not processes.empty:
+        resources = pd.DataFrame({
+            "wall_s": processes["wall_seconds"],
+            "cpu_s": processes["cpu_user_seconds"] + processes["cpu_system_seconds"],
+            "peak_rss_mb": processes["peak_rss_bytes"] / (1024 * 1024),
+        })
+        killed = int((processes["timed_out"].astype(bool) | (processes["returncode"].fillna(0) < 0)).sum())
+        lines += ["", f"Script runs ({killed} timed out or killed):",
+                  resources.describe(percentiles=PERCENTILES).T.drop(columns=["std"]).round(3).to_string()]
+
+    outcome_columns = [f"path_resolutions_{outcome}" for outcome in PATH_OUTCOMES if f"path_resolutions_{outcome}" in sessions]
+    outcomes = sessions[outcome_columns].sum()
+    outcomes.index = [column.rsplit("_", 1)[1] for column in outcome_columns]
+    if outcomes.sum():
+        share = (outcomes / outcomes.sum() * 100).round(1)
+        lines += ["", "Path resolution:", pd.DataFrame({"count": outcomes, "percent": share}).to_string()]
+
+    trend = sessions.set_index("started_at").resample(freq).agg({
+        "session_id": "count",
+        "iterations": "median",
+        "duration_seconds": "median",
+        "tokens_total_token_count": "median",
+    })
+    if outcome_columns:
+        resolved = sessions.set_index("started_at")[outcome_columns].resample(freq).sum()
+        fuzzy = resolved.get("path_resolutions_fuzzy", 0) + resolved.get("path_resolutions_unresolved", 0)
+        trend["fuzzy_or_unresolved_pct"] = (fuzzy / resolved.sum(axis=1).where(lambda s: s > 0) * 100).round(1)
+    trend = trend.rename(columns={
+        "session_id": "sessions",
+        "iterations": "iterations_p50",
+        "duration_seconds": "duration_p50",
+        "tokens_total_token_count": "tokens_p50",
+    })
+    trend = trend[trend["sessions"] > 0]
+    lines += ["", f"Trend ({freq}):", trend.round(2).to_string()]
+    return "\n".join(lines)
+
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    path = args[args.index("--log") + 1] if "--log" in args else RUNS_LOG
+    freq = args[args.index("--freq") + 1] if "--freq" in args else "D"
+    if not os.path.isfile(path):
+        print(f"Error: No run log at {path}")
+        sys.exit(1)
+    sessions, calls, processes = load_runs(path)
+    print(build_report(sessions, calls, processes, freq))
+
+
+recorder = RunRecorder()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+SESSIONS_DIR = ".agent_sessions"
+# Strings longer than this (file contents, test output) are stored once by content hash
+BLOB_THRESHOLD = 1024
+BLOB_KEY = "$blob"
+
+
+def _write_atomically(path, data):
+    # A unique temp name: blobs are shared, so parallel sessions may write the same one
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class SessionStore:
+    """
+    On-disk checkpoints of agent sessions.
+    Each session is a directory holding checkpoint.json (compact JSON of the message
+    history and loop state); large strings are replaced by references to
+    content-addressed blobs shared by every session under the same root.
+    """
+
+    def __init__(self, root=SESSIONS_DIR, blob_threshold=BLOB_THRESHOLD):
+        self.root = root
+        self.blob_threshold = blob_threshold
+        self.blob_dir = os.path.join(root, "blobs")
+
+    @staticmethod
+    def new_session_id():
+        return time.strftime("%Y%m%d-%H%M%S") + "-" + os.urandom(3).hex()
+
+    def _checkpoint_path(self, session_id):
+        return os.path.join(self.root, session_id, "checkpoint.json")
+
+    def _store_blob(self, text):
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.blob_dir, digest)
+        if not os.path.exists(path):
+            _write_atomically(path, data)
+        return {BLOB_KEY: digest}
+
+    def _load_blob(self, digest):
+        with open(os.path.join(self.blob_dir, digest), "rb") as f:
+            return f.read().decode("utf-8")
+
+    def _externalize(self, value):
+        if isinstance(value, str) and len(value) > self.blob_threshold:
+            return self._store_blob(value)
+        if isinstance(value, dict):
+            return {k: self._externalize(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._externalize(v) for v in value]
+        return value
+
+    def _restore(self, value):
+        if isinstance(value, dict):
+            if len(value) == 1 and BLOB_KEY in value:
+                return self._load_blob(value[BLOB_KEY])
+            return {k: self._restore(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._restore(v) for v in value]
+        return value
+
+    def save(self, session_id, state):
+        """Checkpoint a JSON-serializable session state (messages already dumped to dicts)"""
+        os.makedirs(os.path.join(self.root, session_id), exist_ok=True)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        payload = json.dumps(self._externalize(state), separators=(",", ":"), ensure_ascii=False)
+        _write_atomically(self._checkpoint_path(session_id), payload.encode("utf-8"))
+
+    def load(self, session_id):
+        """Return the last checkpointed state of a session ("latest" picks the newest one)"""
+        if session_id == "latest":
+            session_id = self.latest_session()
+            if session_id is None:
+                raise FileNotFoundError(f"No sessions found in {self.root}")
+        path = self._checkpoint_path(session_id)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No checkpoint for session '{session_id}' in {self.root}")
+        with open(path, "r", encoding="utf-8") as f:
+            state = self._restore(json.load(f))
+        state["session_id"] = session_id
+        return state
+
+    def latest_session(self):
+        if not os.path.isdir(self.root):
+            return None
+        sessions = [
+            name for name in os.listdir(self.root)
+            if os.path.isfile(self._checkpoint_path(name))
+        ]
+        if not sessions:
+            return None
+        return max(sessions, key=lambda name: os.path.getmtime(self._checkpoint_path(name)))
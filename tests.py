@@ -1,7 +1,29 @@
 from functions.get_files_info import get_files_info
 from functions.get_file_contents import get_file_content
+from functions.get_files_content import get_files_content
 from functions.write_file import write_file
-from functions.run_python_file import run_python_file
+from functions.write_files import write_files
+from functions.run_python_file import run_python_file, run_with_usage
+from functions.run_affected_tests import run_affected_tests
+from functions.dependency_tracker import get_tracker
+from functions.preflight import check_python_source
+import os
+import signal
+import sys
+import tempfile
+import time
+from unittest import mock
+from model_client import ResilientModelClient, TokenBucket
+from call_function import smart_file_search
+from session_store import SessionStore
+from functions.config import MAX_CHARS
+from functions.read_cache import read_cache
+from prefetcher import prefetcher
+from loop_control import LoopGuard
+from agent_utils import AgentUtils, ContextPacker, estimate_tokens
+from run_analytics import append_record, build_report, load_runs, recorder
+from prompt_cache import PromptCache, repo_summary
+from workspace_watcher import is_watched, start_watcher, stop_watchers, subscribe, unsubscribe, workspace_files
 
 def main():
     working_directory = "calculator"
@@ -93,8 +115,575 @@ def test_run_python_file():
     print("run_python_file nonexistent.py (should error):\n", result5)
     print("\n--- End of nonexistent.py test ---\n")
 
+    # Test 6: a failing script gets the source around the failing lines
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "pkg"))
+        with open(os.path.join(tmp, "pkg", "ops.py"), "w") as f:
+            f.write("def divide(a, b):\n    scale = 1\n    return a / b * scale\n")
+        with open(os.path.join(tmp, "broken.py"), "w") as f:
+            f.write("from pkg.ops import divide\n\nprint(divide(1, 0))\n")
+        result6 = run_python_file(tmp, "broken.py")
+        context = result6[result6.index("Source context:"):] if "Source context:" in result6 else ""
+        print("run_python_file broken.py source context:\n", context)
+        print("marks failing lines:", ">    3 | print(divide(1, 0))" in context, ">    3 |     return a / b * scale" in context)
+    print("\n--- End of broken.py test ---\n")
+
+def test_run_limits():
+    print("\n--- Run Limits Tests ---\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "spin.py"), "w") as f:
+            f.write("while True:\n    pass\n")
+        with open(os.path.join(tmp, "sleep.py"), "w") as f:
+            f.write("import time\ntime.sleep(30)\n")
+
+        # Test 1: a spinning script is killed by the 1 s CPU cap (SIGXCPU, or SIGKILL at the hard limit)
+        returncode, _, _, usage, timed_out = run_with_usage([sys.executable, "spin.py"], tmp, timeout=20, cpu_limit=1)
+        print("CPU cap:", signal.Signals(-returncode).name if returncode < 0 else returncode,
+              "timed out:", timed_out, "cpu >= 1s:", usage["cpu_user_seconds"] + usage["cpu_system_seconds"] >= 0.9)
+
+        # Test 2: a script that never uses CPU is stopped by the wall-clock timeout
+        returncode, _, _, usage, timed_out = run_with_usage([sys.executable, "sleep.py"], tmp, timeout=0.5)
+        print("timeout:", signal.Signals(-returncode).name, "timed out:", timed_out, "wall < 5s:", usage["wall_seconds"] < 5)
+
+        # Test 3: the memory cap turns a huge allocation into a MemoryError
+        returncode, _, stderr, _, _ = run_with_usage(
+            [sys.executable, "-c", "x = bytearray(512 * 1024 ** 2)"], tmp, memory_limit=256 * 1024 ** 2)
+        print("memory cap:", returncode, "MemoryError" in stderr)
+    print("\n--- End of run limits test ---\n")
+
+def test_run_affected_tests():
+    working_directory = "calculator"
+    print("\n--- Run Affected Tests ---\n")
+    # Test 1: nothing written yet
+    result1 = run_affected_tests(working_directory)
+    print("run_affected_tests with no writes:\n", result1)
+
+    # Test 2: pkg/calculator.py changed -> tests.py is affected
+    get_tracker(working_directory).record_write("pkg/calculator.py")
+    result2 = run_affected_tests(working_directory)
+    print("run_affected_tests after pkg/calculator.py write:\n", result2)
+
+    # Test 3: a file nothing imports -> no tests to run
+    get_tracker(working_directory).record_write("lorem.txt")
+    result3 = run_affected_tests(working_directory)
+    print("run_affected_tests after lorem.txt write:\n", result3)
+    print("\n--- End of run_affected_tests test ---\n")
+
+def test_get_files_content():
+    working_directory = "calculator"
+    print("\n--- Multi-file Read Tests ---\n")
+    # Test 1: explicit paths plus one that is outside the working directory
+    result1 = get_files_content(working_directory, ["main.py", "pkg/calculator.py", "../main.py"])
+    print("get_files_content paths:", [f["path"] for f in result1["files"]], result1["errors"])
+
+    # Test 2: glob pattern
+    result2 = get_files_content(working_directory, pattern="pkg/*.py")
+    print("get_files_content pkg/*.py:", [f["path"] for f in result2["files"]])
+
+    # Test 3: shared budget truncates the larger files first
+    result3 = get_files_content(working_directory, ["lorem.txt", "pkg/calculator.py", "pkg/render.py"], max_total_chars=1000)
+    print("get_files_content budget 1000:", [(f["path"], len(f["content"]), f["truncated"]) for f in result3["files"]], result3["total_chars"])
+    print("\n--- End of get_files_content test ---\n")
+
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"fake error {code}")
+        self.code = code
+
+class FakeModelBackend:
+    """Local stand-in for client.models.generate_content: scripted errors and latencies"""
+    def __init__(self, errors=(), latencies=()):
+        self.errors = list(errors)
+        self.latencies = list(latencies)
+        self.calls = 0
+
+    def generate_content(self, **kwargs):
+        self.calls += 1
+        if self.latencies:
+            time.sleep(self.latencies.pop(0))
+        if self.errors:
+            error = self.errors.pop(0)
+            if isinstance(error, Exception):
+                raise error
+            if error:
+                raise FakeAPIError(error)
+        return f"response {self.calls}"
+
+def test_resilient_model_client():
+    print("\n--- Resilient Model Client Tests ---\n")
+    # Test 1: transient 429/503 are retried
+    backend = FakeModelBackend(errors=[429, 503])
+    client = ResilientModelClient(backend.generate_content, base_delay=0.01)
+    print("retry on 429/503:", client.generate_content(contents="hi"), client.metrics.snapshot())
+
+    # Test 2: a 400 is not retried
+    backend = FakeModelBackend(errors=[400])
+    client = ResilientModelClient(backend.generate_content, base_delay=0.01)
+    try:
+        client.generate_content(contents="hi")
+    except FakeAPIError as e:
+        print("400 not retried:", e, "calls:", backend.calls)
+
+    # Test 2b: httpx transport errors (connection refused, read timeout) are retried
+    import httpx
+    backend = FakeModelBackend(errors=[httpx.ConnectError("connection refused"), httpx.ReadTimeout("read timed out")])
+    client = ResilientModelClient(backend.generate_content, base_delay=0.01)
+    print("retry on httpx transport errors:", client.generate_content(contents="hi"), "calls:", backend.calls)
+
+    # Test 3: token bucket paces a burst
+    bucket = TokenBucket(rate=20, capacity=2)
+    waited = sum(bucket.acquire() for _ in range(4))
+    print(f"token bucket waited {waited:.2f}s for 4 requests at 20/s with burst 2")
+
+    # Test 4: a slow request gets hedged once latency history exists
+    backend = FakeModelBackend(latencies=[0.01] * 5 + [0.5, 0.01])
+    client = ResilientModelClient(backend.generate_content, hedge_percentile=90, hedge_min_samples=5)
+    for _ in range(6):
+        client.generate_content(contents="hi")
+    print("hedged requests:", client.metrics.snapshot())
+    print("\n--- End of resilient model client test ---\n")
+
+def test_write_files():
+    print("\n--- Multi-file Write Tests ---\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "main.py"), "w") as f:
+            f.write("print('old')\n")
+
+        # Test 1: a new module and a file importing it are checked and written together
+        result1 = write_files(tmp, [
+            {"file_path": "pkg/helpers.py", "content": "def double(x):\n    return 2 * x\n"},
+            {"file_path": "main.py", "content": "from pkg.helpers import double\nprint(double(2))\n"},
+        ])
+        print("write_files new module + importer:", result1)
+        print("files in pkg:", sorted(os.listdir(os.path.join(tmp, "pkg"))))
+        write_file(tmp, "single.py", "x = 1\n")
+        print("new file mode matches write_file:",
+              oct(os.stat(os.path.join(tmp, "pkg", "helpers.py")).st_mode & 0o777),
+              os.stat(os.path.join(tmp, "pkg", "helpers.py")).st_mode & 0o777 == os.stat(os.path.join(tmp, "single.py")).st_mode & 0o777)
+        os.remove(os.path.join(tmp, "single.py"))
+
+        # Test 2: a failed pre-flight check writes nothing
+        result2 = write_files(tmp, [
+            {"file_path": "main.py", "content": "print('never written')\n"},
+            {"file_path": "broken.py", "content": "def f(:\n"},
+        ])
+        print("write_files with syntax error:", result2)
+        print("broken.py exists:", os.path.exists(os.path.join(tmp, "broken.py")))
+
+        # Test 3: a failing rename rolls back files already replaced
+        real_replace = os.replace
+        def failing_replace(src, dst):
+            if dst.endswith("second.txt"):
+                raise OSError("disk full")
+            return real_replace(src, dst)
+        with mock.patch("functions.write_files.os.replace", side_effect=failing_replace):
+            result3 = write_files(tmp, [
+                {"file_path": "main.py", "content": "print('rolled back')\n"},
+                {"file_path": "new/first.txt", "content": "first"},
+                {"file_path": "second.txt", "content": "second"},
+            ])
+        print("write_files with failing rename:", result3)
+
+        # Test 3a: the backup of an existing target whose rename fails is removed too
+        with open(os.path.join(tmp, "second.txt"), "w") as f:
+            f.write("kept")
+        with mock.patch("functions.write_files.os.replace", side_effect=failing_replace):
+            result3a = write_files(tmp, [
+                {"file_path": "main.py", "content": "print('rolled back')\n"},
+                {"file_path": "second.txt", "content": "second"},
+            ])
+        with open(os.path.join(tmp, "second.txt")) as f:
+            print("write_files failing on existing file:", result3a, "| second.txt:", repr(f.read()),
+                  "| backups left:", [n for n in os.listdir(tmp) if n.endswith(".bak")])
+        os.remove(os.path.join(tmp, "second.txt"))
+
+        # Test 3b: a crash mid-batch (no rollback runs) leaves only hidden backup and temp files
+        class SimulatedCrash(BaseException):
+            pass
+        def crashing_replace(src, dst):
+            if dst.endswith("second.txt"):
+                raise SimulatedCrash()
+            return real_replace(src, dst)
+        with open(os.path.join(tmp, "main.py")) as f:
+            original = f.read()
+        try:
+            with mock.patch("functions.write_files.os.replace", side_effect=crashing_replace):
+                write_files(tmp, [{"file_path": "main.py", "content": original}, {"file_path": "second.txt", "content": "y"}])
+        except SimulatedCrash:
+            pass
+        leftovers = [n for n in os.listdir(tmp) if n.endswith((".bak", ".tmp"))]
+        print("crash leftovers hidden:", bool(leftovers) and all(n.startswith(".") for n in leftovers),
+              "listed:", any(n in get_files_info(tmp) for n in leftovers)
+              or any(p.endswith((".bak", ".tmp")) for p in workspace_files(tmp)))
+        for name in leftovers:
+            os.remove(os.path.join(tmp, name))
+        with open(os.path.join(tmp, "main.py")) as f:
+            print("main.py after rollback:", repr(f.read()))
+        print("left behind:", sorted(os.listdir(tmp)), sorted(os.listdir(os.path.join(tmp, "pkg"))))
+
+        # Test 4: paths outside the working directory are refused
+        print("write_files outside:", write_files(tmp, [{"file_path": "../escape.txt", "content": "x"}]))
+    print("\n--- End of write_files test ---\n")
+
+class FakeFunctionCall:
+    def __init__(self, name, **args):
+        self.name = name
+        self.args = args
+
+class FakeFunctionResult:
+    """Stand-in for the Content returned by call_function"""
+    def __init__(self, result):
+        self.parts = [FakeFunctionResponsePart(result)]
+
+class FakeFunctionResponsePart:
+    def __init__(self, result):
+        self.function_response = FakeFunctionResponse({"result": result})
+
+class FakeFunctionResponse:
+    def __init__(self, response):
+        self.response = response
+
+def test_read_cache():
+    print("\n--- Read Cache and Prefetch Tests ---\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "main.py")
+        with open(path, "w") as f:
+            f.write("print('hello')\n" * 100)
+
+        # Test 1: a prefetched file is served from the cache
+        prefetcher.prefetch([path])
+        print("prefetched:", wait_for(lambda: read_cache.contains(path, MAX_CHARS + 1)))
+        hits = read_cache.hits
+        print("read after prefetch is a hit:", read_cache.read(path, MAX_CHARS + 1) == "print('hello')\n" * 100,
+              read_cache.hits == hits + 1)
+
+        # Test 2: a small read finishing after the prefetch keeps the full entry
+        read_cache.load(path, 100)
+        print("full entry kept:", read_cache.contains(path, MAX_CHARS + 1))
+        result = get_files_content(tmp, ["main.py"], max_total_chars=50)
+        print("small allocation:", len(result["files"][0]["content"]), "full entry kept:", read_cache.contains(path, MAX_CHARS + 1))
+
+        # Test 3: a new mtime invalidates the entry even without a watcher
+        with open(path, "w") as f:
+            f.write("print('changed')\n")
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        misses = read_cache.misses
+        print("after change:", repr(read_cache.read(path, MAX_CHARS + 1)), "miss:", read_cache.misses == misses + 1)
+    print("\n--- End of read cache test ---\n")
+
+def test_loop_guard():
+    print("\n--- Loop Guard Tests ---\n")
+    read = FakeFunctionCall("get_file_content", file_path="main.py")
+
+    # Test 1: identical read-only calls are answered from cache until a write or run
+    guard = LoopGuard()
+    print("first read cached:", guard.cached_result(read) is not None)
+    guard.record_call(read, FakeFunctionResult("print('hi')"))
+    print("repeated read cached:", guard.cached_result(FakeFunctionCall("get_file_content", file_path="main.py")) is not None)
+    guard.record_call(FakeFunctionCall("write_file", file_path="main.py", content="x"), FakeFunctionResult("ok"))
+    print("read cached after write:", guard.cached_result(read) is not None)
+    guard.record_call(read, FakeFunctionResult("x"))
+    guard.record_call(FakeFunctionCall("run_python_file", file_path="main.py"), FakeFunctionResult("ran"))
+    print("read cached after run:", guard.cached_result(read) is not None, "short-circuited:", guard.short_circuited)
+    multi_read = FakeFunctionCall("get_files_content", file_paths=["main.py", "tests.py"])
+    guard.record_call(read, FakeFunctionResult("x"))
+    guard.record_call(multi_read, FakeFunctionResult({"files": []}))
+    print("multi-file read cached:", guard.cached_result(multi_read) is not None,
+          "single read still cached:", guard.cached_result(read) is not None)
+
+    # Test 2: iterations repeating identical calls and results stall the loop
+    guard = LoopGuard(max_stalled_iterations=2)
+    run = FakeFunctionCall("run_python_file", file_path="main.py")
+    reasons = []
+    for _ in range(3):
+        guard.record_call(run, FakeFunctionResult("same failure"))
+        reasons.append(guard.end_iteration())
+    print("stall reasons:", reasons)
+
+    # Test 3: a new result counts as progress and resets the stall counter
+    guard.record_call(run, FakeFunctionResult("different output"))
+    print("after progress:", guard.end_iteration(), guard.stalled_iterations)
+
+    # Test 4: time and token budgets
+    guard = LoopGuard(max_seconds=0.05)
+    print("time budget before:", guard.budget_exhausted())
+    time.sleep(0.06)
+    print("time budget after:", guard.budget_exhausted() is not None)
+    guard = LoopGuard(max_tokens=1000)
+    guard.record_response(FakeResponse(600, 100))
+    print("tokens 700:", guard.budget_exhausted())
+    guard.record_response(FakeResponse(300, 50))
+    print("tokens 1050:", guard.budget_exhausted())
+    print("\n--- End of loop guard test ---\n")
+
+def test_context_packer():
+    print("\n--- Context Packer Tests ---\n")
+    packer = ContextPacker(max_chunk_tokens=40)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "shapes.py")
+        methods = "".join(f"    def method_{i}(self):\n        return {i} * self.side * self.side\n\n" for i in range(8))
+        with open(path, "w") as f:
+            f.write("import math\n\n\ndef area(radius):\n    return math.pi * radius ** 2\n\n\n"
+                    f"class Square:\n    side = 1\n\n{methods}")
+
+        # Test 1: ast-aware chunks; the large class is split per method
+        chunks = packer.chunk_file(path)
+        print("chunks:", [c["name"] for c in chunks][:5], "...", len(chunks))
+
+        # Test 2: the packed text stays within the token budget
+        packed = packer.pack([path], "fix the area of a circle", token_budget=30)
+        used = sum(estimate_tokens(text) for text in packed.values())
+        print("packed for 'area':", used <= 30, packed[path].splitlines()[:2])
+
+        # Test 3: chunks are reused until the file's mtime changes
+        print("cache reused:", packer.chunk_file(path) is chunks)
+        with open(path, "a") as f:
+            f.write("\ndef perimeter(side):\n    return 4 * side\n")
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        print("after edit:", packer.chunk_file(path) is chunks, packer.chunk_file(path)[-1]["name"])
+
+    # Test 4: an exact path mention wins over deeper copies of the same file name
+    utils = AgentUtils()
+    packed = utils.pack_relevant_context("fix the render function in calculator/pkg/render.py")
+    print("packed files:", list(packed))
+    print("initial context header:", utils.initial_context("fix render.py", "calculator").splitlines()[2])
+    print("\n--- End of context packer test ---\n")
+
+def test_session_store():
+    print("\n--- Session Store Tests ---\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(root=tmp, blob_threshold=100)
+        output = "Traceback line\n" * 50
+        first, second = "20250101-000000-aaaaaa", "20250101-000001-bbbbbb"
+        state = {"prompt": "fix it", "iteration": 2, "messages": [{"role": "user", "parts": [{"text": output}]}]}
+
+        # Test 1: large strings are stored once as blobs shared across sessions
+        store.save(first, state)
+        store.save(second, dict(state, iteration=3))
+        with open(os.path.join(tmp, first, "checkpoint.json")) as f:
+            print("checkpoint references blob:", '"$blob"' in f.read())
+        print("blobs:", len(os.listdir(store.blob_dir)), "temp files left:",
+              [n for n in os.listdir(store.blob_dir) if n.endswith(".tmp")])
+
+        # Test 2: load restores the full state
+        loaded = store.load(first)
+        print("round-trip:", loaded["messages"] == state["messages"], loaded["iteration"], loaded["session_id"])
+
+        # Test 3: "latest" picks the most recently saved session
+        os.utime(os.path.join(tmp, first, "checkpoint.json"), (1, 1))
+        print("latest:", store.load("latest")["session_id"], store.load("latest")["iteration"])
+
+        # Test 4: unknown sessions raise FileNotFoundError
+        try:
+            store.load("missing")
+        except FileNotFoundError as e:
+            print("missing session:", e)
+    print("\n--- End of session store test ---\n")
+
+def test_preflight():
+    print("\n--- Pre-flight Check Tests ---\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "pkg"))
+        sources = {
+            "pkg/__init__.py": "",
+            "pkg/t.py": "type Alias = int\n",
+            "pkg/cfg.py": "def load():\n    global SETTINGS\n    SETTINGS = {}\n",
+            "pkg/dyn.py": "globals()['MAGIC'] = 1\n",
+        }
+        for path, content in sources.items():
+            with open(os.path.join(tmp, path), "w") as f:
+                f.write(content)
+
+        # Test 1: syntax errors block the write
+        print("syntax error:", check_python_source(tmp, "main.py", "def f(:\n"))
+
+        # Test 2: a missing local module or name is reported
+        print("missing module:", check_python_source(tmp, "main.py", "from pkg.nothere import x\n"))
+        print("missing name:", check_python_source(tmp, "main.py", "from pkg.t import Missing\n"))
+
+        # Test 3: valid imports are not flagged: type aliases, names bound through
+        # `global` and modules whose namespace is built dynamically
+        valid = "from pkg.t import Alias\nfrom pkg.cfg import SETTINGS\nfrom pkg.dyn import MAGIC\nimport os\n"
+        print("valid imports:", check_python_source(tmp, "main.py", valid))
+
+        # Test 4: optional imports with a fallback and TYPE_CHECKING-only imports are not flagged,
+        # but an unguarded import of the same module still is
+        optional = (
+            "from typing import TYPE_CHECKING\n"
+            "try:\n    from pkg.speedups import fast\nexcept ImportError:\n    fast = None\n"
+            "try:\n    import pkg.native\nexcept (OSError, ModuleNotFoundError):\n    pass\n"
+            "if TYPE_CHECKING:\n    from pkg.stubs import Thing\n"
+        )
+        print("guarded imports:", check_python_source(tmp, "main.py", optional))
+        print("unguarded import:", check_python_source(
+            tmp, "main.py", "try:\n    from pkg.speedups import fast\nexcept KeyError:\n    fast = None\n"))
+    print("\n--- End of pre-flight test ---\n")
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+def test_workspace_watcher(use_inotify):
+    print(f"\n--- Workspace Watcher Tests ({'inotify' if use_inotify else 'polling'}) ---\n")
+    def failing_subscriber(events):
+        raise RuntimeError("subscriber bug")
+    subscribe(failing_subscriber)
+    try:
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("workspace_watcher.logger") as logger:
+            with open(os.path.join(tmp, "a.txt"), "w") as f:
+                f.write("a")
+            watcher = start_watcher(tmp, poll_interval=0.05, use_inotify=use_inotify)
+            print("backend:", watcher.backend_name, "watched:", is_watched(tmp))
+            print("listing before:", get_files_info(tmp).splitlines())
+
+            # Test 1: a new file invalidates the cached listing and the file index,
+            # even though another subscriber raises on every event
+            with open(os.path.join(tmp, "c.txt"), "w") as f:
+                f.write("c")
+            seen = wait_for(lambda: "c.txt" in get_files_info(tmp))
+            print("listing after create:", seen, "index:", sorted(os.path.basename(p) for p in workspace_files(tmp)))
+            print("watcher alive after failing subscriber:", watcher.running, is_watched(tmp),
+                  "errors logged:", logger.exception.call_count > 0)
+
+            # Test 2: deletes are seen too
+            os.remove(os.path.join(tmp, "a.txt"))
+            print("listing after delete:", wait_for(lambda: "a.txt" not in get_files_info(tmp)))
+            stop_watchers()
+            print("watched after stop:", is_watched(tmp))
+    finally:
+        unsubscribe(failing_subscriber)
+        stop_watchers()
+    print("\n--- End of workspace watcher test ---\n")
+
+class FakeUsage:
+    def __init__(self, prompt, candidates):
+        self.prompt_token_count = prompt
+        self.candidates_token_count = candidates
+        self.cached_content_token_count = None
+        self.total_token_count = prompt + candidates
+
+class FakeResponse:
+    def __init__(self, prompt, candidates):
+        self.usage_metadata = FakeUsage(prompt, candidates)
+
+def test_run_analytics():
+    print("\n--- Run Analytics Tests ---\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "runs.jsonl")
+        # Test 1: path resolution outcomes are counted by smart_file_search
+        for session, started_at in (("s1", 1_700_000_000), ("s2", 1_700_090_000)):
+            recorder.reset(session)
+            recorder.started_at = started_at
+            for name in ("main.py", "calculator.py", "calculater.py", "nothing_like_this.xyz"):
+                smart_file_search(name, "calculator")
+            recorder.record_response(FakeResponse(1200, 80))
+            recorder.record_response(FakeResponse(1500, 40))
+            recorder.record_tool_call("get_file_content", 0.002)
+            recorder.record_tool_call("run_python_file", 0.4, error=True)
+            recorder.record_tool_call("get_file_content", 0.0, cached=True)
+            recorder.record_process("main.py", 1, False, {"wall_seconds": 0.4, "cpu_user_seconds": 0.3,
+                                                          "cpu_system_seconds": 0.05, "peak_rss_bytes": 20 * 1024 ** 2})
+            append_record(recorder.to_record(completed=True), log_path)
+        print("path resolutions:", recorder.to_record()["path_resolutions"])
+
+        # Test 2: a partial last line is skipped and the report aggregates both sessions
+        with open(log_path, "a") as f:
+            f.write('{"session_id": "s3", "iter')
+        sessions, calls, processes = load_runs(log_path)
+        print("sessions:", len(sessions), "tool calls:", len(calls), "script runs:", len(processes))
+        print(build_report(sessions, calls, processes))
+    print("\n--- End of run analytics test ---\n")
+
+class FakeCachedContent:
+    def __init__(self, name, model, display_name):
+        self.name = name
+        self.model = model
+        self.display_name = display_name
+        self.expire_time = None
+
+class FakeCacheBackend:
+    """Local stand-in for client.caches: keeps cached contents in memory"""
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.cached = {}
+        self.creates = 0
+        self.updates = []
+        self.contents = {}
+
+    def create(self, model, config):
+        if self.fail:
+            raise FakeAPIError(400)
+        self.creates += 1
+        name = f"cachedContents/{self.creates}"
+        self.cached[name] = FakeCachedContent(name, f"models/{model}", config.display_name)
+        self.contents[name] = config.contents
+        return self.cached[name]
+
+    def update(self, name, config):
+        self.updates.append((name, config.ttl))
+        return self.cached[name]
+
+    def list(self):
+        return list(self.cached.values())
+
+def test_prompt_cache():
+    from google.genai import types
+    print("\n--- Prompt Cache Tests ---\n")
+    system_prompt = "You are a coding agent."
+    summary = [types.Content(role="user", parts=[types.Part(text=repo_summary("calculator"))])]
+    context = [types.Content(role="user", parts=[types.Part(text="calculator/main.py:\nprint('hi')")])]
+    messages = [types.Content(role="user", parts=[types.Part(text="fix the bug")])]
+    now = [1000.0]
+
+    # Test 1: a prefix below the provider minimum is sent inline, without the cache-only summary
+    backend = FakeCacheBackend()
+    cache = PromptCache(backend, "gemini-2.0-flash-001", system_prompt, [], context, summary)
+    request = cache.request(messages)
+    print("small prefix:", len(request["contents"]), "contents, inline system prompt:",
+          request["config"].system_instruction == system_prompt, cache.snapshot()["inline_reason"])
+
+    # Test 2: created once, then referenced by name with only the conversation sent
+    cache = PromptCache(backend, "gemini-2.0-flash-001", system_prompt, [], context, summary, min_tokens=0, clock=lambda: now[0])
+    cache.request(messages)
+    request = cache.request(messages)
+    print("cached:", request["config"].cached_content, len(request["contents"]), "contents, creates:", backend.creates)
+    print("cached prefix holds summary and context:", len(backend.contents[request["config"].cached_content]))
+
+    # Test 3: another session with the same prefix finds the cache by its hash
+    other = PromptCache(backend, "gemini-2.0-flash-001", system_prompt, [], context, summary, min_tokens=0, clock=lambda: now[0])
+    print("reused:", other.request(messages)["config"].cached_content, "creates:", backend.creates)
+
+    # Test 4: the TTL is extended close to expiry
+    now[0] += 3500
+    cache.request(messages)
+    print("refreshed:", backend.updates)
+
+    # Test 5: provider errors fall back to the inline prefix
+    cache = PromptCache(FakeCacheBackend(fail=True), "gemini-2.0-flash-001", system_prompt, [], context, summary, min_tokens=0)
+    request = cache.request(messages)
+    print("fallback:", len(request["contents"]), "contents,", cache.snapshot()["inline_reason"])
+    print("\n--- End of prompt cache test ---\n")
+
 if __name__ == "__main__":
     main()
     #test_get_file_content()
     #test_write_file()
     test_run_python_file()
+    test_run_limits()
+    test_run_affected_tests()
+    test_get_files_content()
+    test_write_files()
+    test_preflight()
+    test_session_store()
+    test_context_packer()
+    test_loop_guard()
+    test_read_cache()
+    test_resilient_model_client()
+    test_run_analytics()
+    test_prompt_cache()
+    test_workspace_watcher(use_inotify=False)
+    test_workspace_watcher(use_inotify=True)
@@ -0,0 +1,361 @@
+"""
+Optional background watcher that keeps in-process workspace caches hot.
+
+Caches subscribe to change events instead of rescanning the tree. A watcher
+uses inotify (through ctypes) on Linux and falls back to polling mtimes
+elsewhere. Caches should only trust their contents for paths that are is_watched();
+without a running watcher they keep rescanning as before.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+from collections import namedtuple
+
+SKIP_DIRS = {"__pycache__", "node_modules"}
+
+# kind is one of "created", "modified", "deleted" or "rescan" (drop everything under path)
+ChangeEvent = namedtuple("ChangeEvent", ["path", "kind", "is_dir"])
+
+_subscribers = []
+_watchers = {}
+_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+def subscribe(callback):
+    """Register callback(events) for every batch of change events"""
+    _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback):
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+def publish(events):
+    if not events:
+        return
+    for callback in list(_subscribers):
+        # One failing cache must not stop the others (or the watcher thread) from seeing events
+        try:
+            callback(events)
+        except Exception:
+            logger.exception("workspace change subscriber %r failed", callback)
+
+
+def notify_changed(path, kind="modified", is_dir=False):
+    """Publish a change made in-process (e.g. by write_file) without waiting for the watcher"""
+    publish([ChangeEvent(os.path.abspath(path), kind, is_dir)])
+
+
+def is_watched(path):
+    """True when a running watcher covers path, so caches for it stay accurate"""
+    abs_path = os.path.abspath(path)
+    with _lock:
+        watchers = list(_watchers.values())
+    return any(w.running and (abs_path == w.abs_root or abs_path.startswith(w.abs_root + os.sep)) for w in watchers)
+
+
+def sync_watchers(path):
+    """Process pending changes under path synchronously, e.g. right after a script ran"""
+    abs_path = os.path.abspath(path)
+    with _lock:
+        watchers = list(_watchers.values())
+    for watcher in watchers:
+        if watcher.running and (abs_path == watcher.abs_root or abs_path.startswith(watcher.abs_root + os.sep)
+                                or watcher.abs_root.startswith(abs_path + os.sep)):
+            watcher.sync()
+
+
+def start_watcher(root, poll_interval=1.0, use_inotify=True):
+    """Start (or return the already running) watcher for root"""
+    abs_root = os.path.abspath(root)
+    with _lock:
+        watcher = _watchers.get(abs_root)
+        if watcher is None or not watcher.running:
+            watcher = _watchers[abs_root] = WorkspaceWatcher(abs_root, poll_interval, use_inotify)
+            watcher.start()
+        return watcher
+
+
+def stop_watchers():
+    with _lock:
+        watchers = list(_watchers.values())
+        _watchers.clear()
+    for watcher in watchers:
+        watcher.stop()
+
+
+def _skip(name):
+    return name.startswith(".") or name in SKIP_DIRS
+
+
+def is_staging_file(name):
+    """Hidden temp or backup file of a write_files batch (left behind only by a crash)"""
+    return name.startswith(".") and name.endswith((".tmp", ".bak"))
+
+
+def walk_files(abs_root):
+    """Absolute paths of workspace files, skipping hidden and cache directories"""
+    for root, dirs, files in os.walk(abs_root):
+        dirs[:] = [d for d in dirs if not _skip(d)]
+        for name in files:
+            if not name.startswith("."):
+                yield os.path.join(root, name)
+
+
+class _InotifyBackend:
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+                  | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, abs_root):
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name or "libc.so.6", use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.abs_root = abs_root
+        self.watches = {}
+        self._add_tree(abs_root)
+
+    def _add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.WATCH_MASK)
+        if wd >= 0:
+            self.watches[wd] = directory
+
+    def _add_tree(self, directory):
+        for root, dirs, _ in os.walk(directory):
+            dirs[:] = [d for d in dirs if not _skip(d)]
+            self._add_watch(root)
+
+    def fileno(self):
+        return self.fd
+
+    def read_events(self):
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            if not data:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                events.extend(self._translate(wd, mask, os.fsdecode(name)))
+
+    def _translate(self, wd, mask, name):
+        if mask & self.IN_Q_OVERFLOW:
+            return [ChangeEvent(self.abs_root, "rescan", True)]
+        if mask & self.IN_IGNORED:
+            self.watches.pop(wd, None)
+            return []
+        directory = self.watches.get(wd)
+        if directory is None or (name and _skip(name)):
+            return []
+        path = os.path.join(directory, name) if name else directory
+        is_dir = bool(mask & self.IN_ISDIR)
+        if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+            if not is_dir:
+                return [ChangeEvent(path, "created", False)]
+            # Files may land in a new directory before its watch exists
+            self._add_tree(path)
+            return [ChangeEvent(path, "created", True)] + [
+                ChangeEvent(file_path, "created", False) for file_path in walk_files(path)
+            ]
+        if mask & (self.IN_DELETE | self.IN_MOVED_FROM | self.IN_DELETE_SELF):
+            return [ChangeEvent(path, "deleted", is_dir)]
+        return [ChangeEvent(path, "modified", is_dir)]
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollingBackend:
+    def __init__(self, abs_root):
+        self.abs_root = abs_root
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for root, dirs, files in os.walk(self.abs_root):
+            dirs[:] = [d for d in dirs if not _skip(d)]
+            entries = [(os.path.join(root, d), True) for d in dirs]
+            entries += [(os.path.join(root, f), False) for f in files if not f.startswith(".")]
+            for path, is_dir in entries:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, 0 if is_dir else stat.st_size, is_dir)
+        return snapshot
+
+    def fileno(self):
+        return None
+
+    def read_events(self):
+        current = self._scan()
+        events = []
+        for path, signature in current.items():
+            previous = self.snapshot.get(path)
+            if previous is None:
+                events.append(ChangeEvent(path, "created", signature[2]))
+            elif previous != signature:
+                events.append(ChangeEvent(path, "modified", signature[2]))
+        for path in self.snapshot.keys() - current.keys():
+            events.append(ChangeEvent(path, "deleted", self.snapshot[path][2]))
+        self.snapshot = current
+        return events
+
+    def close(self):
+        pass
+
+
+class WorkspaceWatcher:
+    """Background thread publishing change events for one directory tree"""
+
+    def __init__(self, root, poll_interval=1.0, use_inotify=True):
+        self.abs_root = os.path.abspath(root)
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.backend = None
+        self._active = False
+        self._thread = None
+        self._stop = threading.Event()
+        self._sync_lock = threading.Lock()
+
+    @property
+    def running(self):
+        """True while the watcher thread is alive; caches stop trusting events once it dies"""
+        return self._active and self._thread is not None and self._thread.is_alive()
+
+    @property
+    def backend_name(self):
+        return "inotify" if isinstance(self.backend, _InotifyBackend) else "polling"
+
+    def start(self):
+        if self.running:
+            return
+        self.backend = None
+        if self.use_inotify:
+            try:
+                self.backend = _InotifyBackend(self.abs_root)
+            except (OSError, AttributeError):
+                self.backend = None
+        if self.backend is None:
+            self.backend = _PollingBackend(self.abs_root)
+        self._stop.clear()
+        self._active = True
+        self._thread = threading.Thread(target=self._run, name="workspace-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._active:
+            return
+        self._active = False
+        self._stop.set()
+        self._thread.join()
+        self.backend.close()
+
+    def sync(self):
+        """Read and publish whatever changes are pending right now"""
+        with self._sync_lock:
+            events = self.backend.read_events()
+        publish(events)
+
+    def _run(self):
+        fd = self.backend.fileno()
+        while not self._stop.is_set():
+            if fd is None:
+                self._stop.wait(self.poll_interval)
+            else:
+                ready, _, _ = select.select([fd], [], [], self.poll_interval)
+                if not ready:
+                    continue
+            if not self._stop.is_set():
+                try:
+                    self.sync()
+                except Exception:
+                    # Exiting clears `running`, so caches fall back to rescanning
+                    logger.exception("workspace watcher for %s stopped", self.abs_root)
+                    return
+
+
+class WorkspaceIndex:
+    """
+    File listing of a tree kept current from change events while a watcher runs,
+    and rescanned on every call otherwise.
+    """
+
+    def __init__(self, root):
+        self.abs_root = os.path.abspath(root)
+        self._files = None
+        self._lock = threading.Lock()
+        subscribe(self._on_changes)
+
+    def _on_changes(self, events):
+        with self._lock:
+            self._apply(events)
+
+    def _apply(self, events):
+        if self._files is None:
+            return
+        prefix = self.abs_root + os.sep
+        for event in events:
+            if event.path != self.abs_root and not event.path.startswith(prefix):
+                continue
+            if event.kind == "rescan" or (event.is_dir and event.kind == "deleted"):
+                self._files = None
+                return
+            if event.is_dir:
+                # Files inside new directories arrive as their own events
+                continue
+            if event.kind == "deleted":
+                self._files.discard(event.path)
+            elif not any(_skip(part) for part in os.path.relpath(event.path, self.abs_root).split(os.sep)):
+                self._files.add(event.path)
+
+    def files(self):
+        """Absolute paths of the files under the root"""
+        if not is_watched(self.abs_root):
+            self._files = None
+            return list(walk_files(self.abs_root))
+        with self._lock:
+            if self._files is None:
+                self._files = set(walk_files(self.abs_root))
+            return sorted(self._files)
+
+
+_indexes = {}
+
+
+def workspace_files(root):
+    """Files under root from the shared index for that root"""
+    abs_root = os.path.abspath(root)
+    index = _indexes.get(abs_root)
+    if index is None:
+        index = _indexes[abs_root] = WorkspaceIndex(abs_root)
+    return index.files()